@@ -0,0 +1,40 @@
+"""Post generation hook, removes the code for performance-profile options that weren't selected.
+Runs in the generated project's root directory.
+"""
+import os
+import shutil
+
+# Paths only needed by a specific option value, keyed by (option, value)
+OPTION_PATHS = {
+    ("server_mode", "hypercorn-h2c"): ["benchmarks/bench_http2.py"],
+    ("response_caching", "in-memory"): ["api/response_cache.py", "tests/unit/test_response_cache.py"],
+    ("metrics", "stats-endpoint"): ["api/routers/metrics.py", "tests/unit/test_metrics.py"],
+    ("database", "postgresql"): ["db", "tests/unit/test_db.py"],
+    ("batch_endpoint", "enabled"): ["api/routers/batch.py", "tests/unit/test_batch.py"],
+}
+
+SELECTED_OPTIONS = {
+    "server_mode": "{{ cookiecutter.server_mode }}",
+    "response_caching": "{{ cookiecutter.response_caching }}",
+    "metrics": "{{ cookiecutter.metrics }}",
+    "database": "{{ cookiecutter.database }}",
+    "batch_endpoint": "{{ cookiecutter.batch_endpoint }}",
+}
+
+
+def remove_unselected_paths() -> None:
+    """Remove paths of option values other than the selected ones"""
+    for (option, value), paths in OPTION_PATHS.items():
+        if SELECTED_OPTIONS[option] == value:
+            continue
+
+        for path in paths:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.isfile(path):
+                os.remove(path)
+    return
+
+
+if __name__ == "__main__":
+    remove_unselected_paths()
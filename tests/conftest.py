@@ -0,0 +1,21 @@
+"""Shared pytest hooks for template tests"""
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Print the per-phase timings recorded by each generated project test.
+    Reads them from the test reports' user_properties, so it also works when tests run on pytest-xdist workers.
+    """
+    rows = []
+    for report in terminalreporter.stats.get("passed", []) + terminalreporter.stats.get("failed", []):
+        for name, value in report.user_properties:
+            if name == "phase_timings" and report.when == "call":
+                rows.append((report.nodeid.split("[")[-1].rstrip("]"), value))
+
+    if not rows:
+        return
+
+    phases = list(rows[0][1])
+    terminalreporter.section("generated project phase timings (s)")
+    terminalreporter.write_line(f"{'config':<30}" + "".join(f"{phase:>10}" for phase in phases))
+    for config, timings in sorted(rows):
+        terminalreporter.write_line(f"{config:<30}" + "".join(f"{timings[phase]:>10.2f}" for phase in phases))
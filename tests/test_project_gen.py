@@ -1,15 +1,43 @@
+import hashlib
+import importlib.util
+import json
 import logging
 import os
-import tempfile
+import shutil
 import subprocess
-from typing import Optional
+import sys
+import tempfile
+import time
+import venv
+from typing import List, Optional
 
 import pytest
 from cookiecutter.main import cookiecutter
+from filelock import FileLock
 
 
 logging.basicConfig(level="INFO")
 
+TEMPLATE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_post_gen_hook():
+    """Import the post generation hook, to check generated projects against its OPTION_PATHS"""
+    spec = importlib.util.spec_from_file_location("post_gen_project", os.path.join(TEMPLATE_DIR, "hooks", "post_gen_project.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+POST_GEN_HOOK = load_post_gen_hook()
+
+# Max seconds per phase for each generated project, override via env var, ex. `TEMPLATE_TEST_BUDGET_IMPORT_S=2`
+PHASE_BUDGETS_S = {
+    "generate": float(os.getenv("TEMPLATE_TEST_BUDGET_GENERATE_S", "10")),
+    "import": float(os.getenv("TEMPLATE_TEST_BUDGET_IMPORT_S", "10")),
+    "test": float(os.getenv("TEMPLATE_TEST_BUDGET_TEST_S", "120")),
+}
+
 
 @pytest.fixture(scope="module")
 def temp_output_dir() -> str:
@@ -19,12 +47,89 @@ def temp_output_dir() -> str:
     return temp_dir
 
 
+def rendered_requirements(template_values_list: list) -> List[str]:
+    """Union of the requirements of projects generated with each set of template values,
+    as requirements files are rendered per option (see cookiecutter.json)
+    """
+    requirements = set()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for i, template_values in enumerate(template_values_list):
+            project_dir = gen_project(output_dir=os.path.join(temp_dir, str(i)), template_values=template_values)
+            for requirements_file in ("requirements.txt", "requirements-dev.txt"):
+                with open(os.path.join(project_dir, requirements_file)) as f:
+                    requirements.update(x.strip() for x in f if x.strip() and not x.startswith("#"))
+    return sorted(requirements)
+
+
+def prepare_dependency_env(env_root: str, requirements: List[str]) -> str:
+    """Create (once) a virtual env with the generated projects' requirements installed, shared by all test workers.
+    Envs are keyed by a hash of the requirements and python version, so they're reused until either changes.
+
+    Args:
+        env_root (str): Directory to create and cache envs in.
+        requirements (List[str]): Requirement specifiers to install.
+
+    Returns:
+        str: Path to the env's python executable.
+    """
+    key = hashlib.sha256(sys.version.encode() + "\n".join(requirements).encode())
+
+    env_dir = os.path.join(env_root, f"env-{key.hexdigest()[:16]}")
+    python = os.path.join(env_dir, "Scripts" if os.name == "nt" else "bin", "python")
+
+    os.makedirs(env_root, exist_ok=True)
+    with FileLock(f"{env_dir}.lock"):
+        if os.path.isfile(os.path.join(env_dir, ".ready")):
+            return python
+
+        logging.info(f"Preparing dependency env at {env_dir}")
+        shutil.rmtree(env_dir, ignore_errors=True)
+        venv.create(env_dir, with_pip=True)
+        subprocess.run(args=[python, "-m", "pip", "install", "-q"] + requirements, check=True)
+        open(os.path.join(env_dir, ".ready"), "w").close()
+
+    return python
+
+
+@pytest.fixture(scope="session")
+def dependency_env() -> str:
+    """Python executable to run generated projects with.
+    Uses `TEMPLATE_TEST_PYTHON` if set (ex. an env with the requirements already installed), else a cached env.
+    """
+    if os.getenv("TEMPLATE_TEST_PYTHON"):
+        return os.environ["TEMPLATE_TEST_PYTHON"]
+
+    env_root = os.getenv("TEMPLATE_TEST_ENV_DIR", os.path.join(tempfile.gettempdir(), "gcp-fastapi-microservice-envs"))
+    return prepare_dependency_env(env_root, rendered_requirements(TEST_CONFIGS))
+
+
+# Each config runs on its own pytest-xdist worker, see `addopts` in pyproject.toml
+# Together the configs cover every value of the performance-profile options in cookiecutter.json
 TEST_CONFIGS = [
     {
         "project_name": "Hello Test1",
         "project_slug": "hello_test1",
         "project_description": "Test Project",
     },
+    {
+        "project_name": "Hello Test2",
+        "project_slug": "hello_test2",
+        "project_description": "Test high-throughput Project in another region",
+        "default_gcp_region": "europe-west1",
+        "json_backend": "orjson",
+        "server_mode": "uvicorn-workers",
+        "response_caching": "in-memory",
+        "metrics": "stats-endpoint",
+        "log_pipeline": "async-queue",
+        "database": "postgresql",
+        "batch_endpoint": "enabled",
+    },
+    {
+        "project_name": "Hello Test3",
+        "project_slug": "hello_test3",
+        "project_description": "Test HTTP/2 Project",
+        "server_mode": "hypercorn-h2c",
+    },
 ]
 
 
@@ -88,19 +193,51 @@ def run_script(root_dir: str, command: str, script_path: str, args: Optional[lis
     return resp
 
 
+def assert_options_rendered(project_dir: str, template_values: dict) -> None:
+    """Assert only the code and requirements of the selected performance-profile options were generated"""
+    for (option, value), paths in POST_GEN_HOOK.OPTION_PATHS.items():
+        selected = template_values.get(option) == value
+        for path in paths:
+            assert os.path.exists(os.path.join(project_dir, path)) == selected, f"Unexpected presence of {path}"
+
+    with open(os.path.join(project_dir, "requirements.txt")) as f:
+        requirements = f.read()
+    assert ("orjson" in requirements) == (template_values.get("json_backend") == "orjson")
+    assert ("hypercorn" in requirements) == (template_values.get("server_mode") == "hypercorn-h2c")
+    assert ("asyncpg" in requirements) == (template_values.get("database") == "postgresql")
 
-@pytest.mark.parametrize("template_values", TEST_CONFIGS)
-def test_project_gen(template_values: dict, temp_output_dir):
+
+def record_timings(record_property, template_values: dict, timings: dict) -> None:
+    """Attach phase timings to the test report (summarized by tests/conftest.py), optionally append them to
+    the JSON lines file at `TEMPLATE_TEST_TIMINGS_FILE` to compare across template changes.
+    """
+    record_property("phase_timings", timings)
+
+    timings_file = os.getenv("TEMPLATE_TEST_TIMINGS_FILE")
+    if timings_file:
+        with FileLock(f"{timings_file}.lock"), open(timings_file, "a") as f:
+            f.write(json.dumps({"project_slug": template_values["project_slug"], **timings}) + "\n")
+
+
+@pytest.mark.parametrize("template_values", TEST_CONFIGS, ids=[x["project_slug"] for x in TEST_CONFIGS])
+def test_project_gen(template_values: dict, temp_output_dir, dependency_env, record_property):
     """Test project generation given a set of template values.
     Test project is generated at expected output dir,
-    Test generated project's test pass by running test command in a subprocess.
+    Test only the selected options' code and requirements are generated,
+    Test generated project's app imports and its tests pass by running commands in a subprocess,
+    Test each phase (generate, import, test) finishes within its budget in PHASE_BUDGETS_S.
 
     Args:
         template_values (dict): Cookiecutter template values to use in project generation.
         temp_output_dir (_type_): A temp directory to generate projects in. Will be removed at test completion.
+        dependency_env (str): Python executable with the generated project's requirements installed.
+        record_property (_type_): pytest fixture to attach phase timings to the test report.
     """
+    timings = {}
 
+    start = time.perf_counter()
     generated_project_dir = gen_project(output_dir=temp_output_dir, template_values=template_values)
+    timings["generate"] = time.perf_counter() - start
 
     # Assert project dir exists
     assert os.path.isdir(generated_project_dir), f"Project not found at {generated_project_dir}"
@@ -109,13 +246,37 @@ def test_project_gen(template_values: dict, temp_output_dir):
     project_folder = os.path.basename(generated_project_dir)
     assert project_folder == template_values["project_slug"], f"Generated project dir `{project_folder}` differs from exptect of `{template_values['project_slug']}`"
 
+    assert_options_rendered(generated_project_dir, template_values)
+
+    # Import the app in a fresh interpreter, as on a cold start
+    start = time.perf_counter()
+    import_resp = subprocess.run(
+        args=[dependency_env, "-c", "import main"],
+        cwd=generated_project_dir,
+        env={**os.environ, "SERVICE_CONFIG_FILE": "config/service_configs/local.env"},
+        capture_output=True,
+        check=False,
+    )
+    timings["import"] = time.perf_counter() - start
+
+    if import_resp.returncode != 0:
+        raise Exception(
+            f"Failed to import app in generated project with values={template_values}\nstderr:{import_resp.stderr.decode('utf-8')}"
+        )
 
     # Run test scripts in sub-process, assert they pass
-    tests_resp = run_script(root_dir=generated_project_dir, command="python", script_path="cli/main.py", args="test")
+    start = time.perf_counter()
+    tests_resp = run_script(root_dir=generated_project_dir, command=dependency_env, script_path="cli/main.py", args="test")
+    timings["test"] = time.perf_counter() - start
 
     if tests_resp.returncode != 0:
         raise Exception(
             f"Failed to pass tests in generated project with values={template_values}\nstdout:{tests_resp.stdout.decode('utf-8')}"
         )
 
+    record_timings(record_property, template_values, timings)
+
+    over_budget = {phase: seconds for phase, seconds in timings.items() if seconds > PHASE_BUDGETS_S[phase]}
+    assert not over_budget, f"Phases over budget ({PHASE_BUDGETS_S}): {over_budget}"
+
     return
@@ -0,0 +1,298 @@
+"""Inbound Google ID token (JWT) verification, for services that verify their callers themselves.
+- `JWKSCache` holds the issuer's signing keys, refreshed in the background once their `Cache-Control` max-age passes
+  (and on an unknown key ID, at most every `min_refresh_interval` seconds), so requests don't wait on key fetches.
+- `TokenVerifier` checks signature, expiry, audience and issuer, and caches verified claims by token hash until the
+  token's `exp`, so repeat calls with the same token skip the signature check.
+
+Initialized in the app lifespan when `AUTH_AUDIENCE` is set (see main.py), protect routes with the
+`verify_id_token` dependency, ex. `async def handler(claims: dict = Depends(verify_id_token))`.
+docs: https://cloud.google.com/run/docs/authenticating/service-to-service
+"""
+import asyncio
+import contextvars
+import copy
+import hashlib
+import logging
+import re
+import time
+from typing import Dict, Iterable, Optional, Union
+
+import httpx
+import jwt
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from utils.bounded_cache import BoundedTTLCache
+from utils.http_client import ResilientHTTPClient
+from utils.metrics import register_stats, unregister_stats
+
+GOOGLE_JWKS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ("https://accounts.google.com", "accounts.google.com")
+
+MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+
+class JWKSUnavailableError(Exception):
+    """Raised when no signing keys could be fetched, tokens can't be verified until a fetch succeeds"""
+
+
+class JWKSCache:
+    """Signing keys of a token issuer by key ID, fetched from its JWKS URL"""
+
+    def __init__(
+        self,
+        url: str = GOOGLE_JWKS_URL,
+        client: Optional[Union[httpx.AsyncClient, ResilientHTTPClient]] = None,
+        default_max_age: float = 3600,
+        min_refresh_interval: float = 30,
+        fetch_timeout: float = 10,
+    ):
+        """
+        Args:
+            url (str): JWKS URL.
+            client (Optional[Union[httpx.AsyncClient, ResilientHTTPClient]]): Client to fetch keys with.
+            default_max_age (float): Seconds keys are used for if the response has no `Cache-Control` max-age.
+            min_refresh_interval (float): Min seconds between fetches, ex. when tokens have unknown key IDs.
+            fetch_timeout (float): Max seconds a fetch takes, including any retries by the client.
+        """
+        self.url = url
+        self.client = client or httpx.AsyncClient()
+        self.default_max_age = default_max_age
+        self.min_refresh_interval = min_refresh_interval
+        self.fetch_timeout = fetch_timeout
+
+        self.keys: Dict[str, jwt.PyJWK] = {}
+        self.expires_at = 0.0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self._fetched_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def get_key(self, kid: str) -> Optional[jwt.PyJWK]:
+        """Signing key by key ID, None if the issuer has no such key.
+
+        Raises:
+            JWKSUnavailableError: If no keys could be fetched, fetches are retried every `min_refresh_interval`
+                seconds so an issuer outage doesn't cause a fetch per request.
+        """
+        if not self.keys:
+            fetching = self._refresh_task is not None and not self._refresh_task.done()
+            if not fetching and self._fetched_at is not None:
+                if time.monotonic() - self._fetched_at < self.min_refresh_interval:
+                    raise JWKSUnavailableError(f"No JWKS signing keys, last fetch failed; url={self.url}")
+            await asyncio.shield(self._refresh())
+            if not self.keys:
+                raise JWKSUnavailableError(f"No JWKS signing keys fetched; url={self.url}")
+        elif time.monotonic() >= self.expires_at:
+            # Keep serving the current keys while they're refreshed
+            self._refresh()
+
+        key = self.keys.get(kid)
+        if key is None and time.monotonic() - self._fetched_at >= self.min_refresh_interval:
+            # Keys may have rotated before the cached set expired
+            await asyncio.shield(self._refresh())
+            key = self.keys.get(kid)
+        return key
+
+    async def close(self) -> None:
+        """Cancel an in progress refresh, call on shutdown"""
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+        return
+
+    def _refresh(self) -> asyncio.Task:
+        # Concurrent refreshes share a single fetch
+        if self._refresh_task is None or self._refresh_task.done():
+            # Run in an empty context, not the triggering request's, so its deadline (see api/deadline.py) doesn't
+            # limit a fetch shared by every request
+            self._refresh_task = contextvars.Context().run(asyncio.create_task, self._fetch())
+        return self._refresh_task
+
+    async def _fetch(self) -> None:
+        self._fetched_at = time.monotonic()
+        try:
+            response = await asyncio.wait_for(self.client.get(self.url), self.fetch_timeout)
+            response.raise_for_status()
+            keys = {}
+            for jwk in response.json()["keys"]:
+                try:
+                    keys[jwk["kid"]] = jwt.PyJWK(jwk)
+                except (jwt.PyJWKError, jwt.InvalidKeyError, KeyError):
+                    logging.warning(f"Skipping unsupported JWKS key; url={self.url}; kid={jwk.get('kid')}")
+            if not keys:
+                raise JWKSUnavailableError("JWKS response has no usable keys")
+        except Exception:  # pylint: disable=broad-except
+            self.refresh_errors += 1
+            self.expires_at = time.monotonic() + self.min_refresh_interval
+            logging.exception(f"JWKS fetch failed, keeping current keys; url={self.url}; keys={len(self.keys)}")
+            return
+
+        self.keys = keys
+        self.expires_at = self._fetched_at + self._max_age(response)
+        self.refreshes += 1
+        logging.debug(f"Refreshed JWKS; url={self.url}; keys={len(keys)}")
+        return
+
+    def _max_age(self, response: httpx.Response) -> float:
+        match = MAX_AGE_PATTERN.search(response.headers.get("cache-control", ""))
+        if not match:
+            return self.default_max_age
+        # Time the response already spent in shared caches counts against its max-age
+        return max(int(match.group(1)) - int(response.headers.get("age", 0)), 0)
+
+
+class TokenVerifier:
+    """Verifies signed ID tokens against a `JWKSCache`, caching verified claims until the token expires"""
+
+    def __init__(
+        self,
+        audience: str,
+        issuers: Iterable[str] = GOOGLE_ISSUERS,
+        jwks: Optional[JWKSCache] = None,
+        max_tokens: int = 10000,
+        algorithms: Iterable[str] = ("RS256",),
+        name: str = "auth",
+    ):
+        """
+        Args:
+            audience (str): Expected `aud` claim, ex. the service URL.
+            issuers (Iterable[str]): Accepted `iss` claims.
+            jwks (Optional[JWKSCache]): Signing keys, Google's if None.
+            max_tokens (int): Max verified tokens cached, 0 to verify every request.
+            algorithms (Iterable[str]): Accepted signing algorithms.
+            name (str): Name the verifier's stats are registered under.
+        """
+        self.audience = audience
+        self.issuers = set(issuers)
+        self.jwks = jwks or JWKSCache()
+        self.algorithms = list(algorithms)
+        self.name = name
+
+        self.verified = BoundedTTLCache(max_items=max_tokens) if max_tokens else None
+        self.verifications = 0
+        self.failures = 0
+        register_stats(name, self.stats)
+
+    async def verify(self, token: str) -> dict:
+        """Verify a token, returning a copy of its claims.
+
+        Raises:
+            jwt.InvalidTokenError: If the token is malformed, expired, or has an invalid signature, audience or issuer.
+            JWKSUnavailableError: If the issuer's signing keys couldn't be fetched.
+        """
+        token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        if self.verified is not None:
+            claims = self.verified.get(token_hash)
+            if claims is not None:
+                # Cached claims are shared by requests with the same token, handlers get their own copy
+                return copy.deepcopy(claims)
+
+        self.verifications += 1
+        try:
+            claims = await self._verify(token)
+        except jwt.InvalidTokenError:
+            self.failures += 1
+            raise
+
+        if self.verified is not None:
+            self.verified.set(token_hash, copy.deepcopy(claims), ttl=claims["exp"] - time.time())
+        return claims
+
+    async def close(self) -> None:
+        """Stop refreshing keys, call on shutdown"""
+        await self.jwks.close()
+        unregister_stats(self.name)
+        return
+
+    def stats(self) -> dict:
+        """Verification counters, verified token cache stats and JWKS refresh counters"""
+        return {
+            "verifications": self.verifications,
+            "failures": self.failures,
+            "verified_cache": self.verified.stats() if self.verified is not None else None,
+            "jwks_keys": len(self.jwks.keys),
+            "jwks_refreshes": self.jwks.refreshes,
+            "jwks_refresh_errors": self.jwks.refresh_errors,
+        }
+
+    async def _verify(self, token: str) -> dict:
+        header = jwt.get_unverified_header(token)
+        if header.get("alg") not in self.algorithms:
+            raise jwt.InvalidAlgorithmError(f"Unsupported algorithm; alg={header.get('alg')}")
+
+        key = await self.jwks.get_key(header.get("kid", ""))
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key; kid={header.get('kid')}")
+
+        claims = jwt.decode(
+            token,
+            key.key,
+            algorithms=self.algorithms,
+            audience=self.audience,
+            options={"require": ["exp", "iat", "iss", "aud"]},
+        )
+        if claims["iss"] not in self.issuers:
+            raise jwt.InvalidIssuerError(f"Invalid issuer; iss={claims['iss']}")
+        return claims
+
+
+_token_verifier: Optional[TokenVerifier] = None
+
+
+def init_token_verifier(
+    audience: str,
+    issuers: Iterable[str] = GOOGLE_ISSUERS,
+    jwks_url: str = GOOGLE_JWKS_URL,
+    client: Optional[Union[httpx.AsyncClient, ResilientHTTPClient]] = None,
+    **verifier_kwargs,
+) -> TokenVerifier:
+    """Create the service-wide token verifier, called from the app lifespan.
+
+    Args:
+        audience (str): Expected `aud` claim, ex. the service URL.
+        issuers (Iterable[str]): Accepted `iss` claims.
+        jwks_url (str): JWKS URL of the issuer's signing keys.
+        client (Optional[Union[httpx.AsyncClient, ResilientHTTPClient]]): Client to fetch keys with.
+        **verifier_kwargs: Passed to `TokenVerifier`.
+    """
+    global _token_verifier  # pylint: disable=global-statement
+    _token_verifier = TokenVerifier(
+        audience=audience, issuers=issuers, jwks=JWKSCache(url=jwks_url, client=client), **verifier_kwargs
+    )
+    return _token_verifier
+
+
+def get_token_verifier() -> TokenVerifier:
+    """Service-wide token verifier"""
+    if _token_verifier is None:
+        raise RuntimeError("Token verifier not initialized, set AUTH_AUDIENCE (see init_token_verifier())")
+    return _token_verifier
+
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+async def verify_id_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)) -> dict:
+    """FastAPI dependency verifying the request's `Authorization: Bearer` ID token, returning its claims"""
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing bearer token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    try:
+        return await get_token_verifier().verify(credentials.credentials)
+    except jwt.InvalidTokenError as exc:
+        logging.info(f"Rejected ID token; error={exc}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token",
+            headers={"WWW-Authenticate": 'Bearer error="invalid_token"'},
+        ) from exc
+    except JWKSUnavailableError as exc:
+        logging.warning(f"ID token verification unavailable; error={exc}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Token verification unavailable"
+        ) from exc
@@ -0,0 +1,161 @@
+"""Request deadlines, so stuck or abandoned requests don't hold instance capacity until Cloud Run's `gcr_timeout`.
+- `DeadlineMiddleware` gives each request a deadline, from the caller's `X-Request-Timeout-Ms` header (capped) or the
+  default budget, and cancels the handler when the deadline passes (responding 504) or the client disconnects.
+- `BaseAPIRoute.request_timeout` narrows the deadline for a route's handler (see api/routers/core.py).
+- Outbound calls use the remaining budget, ex. `await client.get(url, timeout=outbound_timeout(10),
+  headers=deadline_headers())`, so downstream work stops when the caller stops waiting.
+"""
+import asyncio
+import json
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Caller's remaining budget in milliseconds, relative so clock skew between services doesn't matter
+REQUEST_TIMEOUT_HEADER = "X-Request-Timeout-Ms"
+DEADLINE_EXCEEDED_DETAIL = "Request deadline exceeded"
+
+# Deadline of the current request, as a `time.monotonic()` timestamp
+deadline_var: ContextVar[Optional[float]] = ContextVar("deadline_var", default=None)
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left until the current request's deadline, None outside of a request with a deadline"""
+    deadline = deadline_var.get()
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0)
+
+
+def outbound_timeout(default: float) -> float:
+    """Timeout for an outbound call, `default` seconds capped at the remaining budget"""
+    remaining = remaining_budget()
+    return default if remaining is None else min(default, remaining)
+
+
+def deadline_headers() -> Dict[str, str]:
+    """Headers propagating the remaining budget to a downstream service using this same middleware"""
+    remaining = remaining_budget()
+    if remaining is None:
+        return {}
+    return {REQUEST_TIMEOUT_HEADER: str(int(remaining * 1000))}
+
+
+async def run_with_timeout(call: Callable[[], Awaitable[Any]], timeout: float) -> Any:
+    """Run `call` with the deadline narrowed to `timeout` seconds from now, cancelling it if the deadline passes.
+
+    Raises:
+        HTTPException: 504 if the deadline passes.
+    """
+    remaining = remaining_budget()
+    budget = timeout if remaining is None else min(timeout, remaining)
+    token = deadline_var.set(time.monotonic() + budget)
+    try:
+        return await asyncio.wait_for(call(), budget)
+    except asyncio.TimeoutError:
+        # Timeouts raised by the call itself (ex. a client timeout) before the deadline are re-raised as is
+        if remaining_budget() > 0:
+            raise
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=DEADLINE_EXCEEDED_DETAIL)
+    finally:
+        deadline_var.reset(token)
+
+
+class DeadlineMiddleware:
+    """ASGI middleware running each request's handler until its deadline or the client disconnects.
+    Requests timing out before their response started get a 504, otherwise the handler is just cancelled.
+    """
+
+    def __init__(self, app: ASGIApp, default_timeout: float, max_timeout: float):
+        """
+        Args:
+            app (ASGIApp): Wrapped app.
+            default_timeout (float): Seconds requests without a `X-Request-Timeout-Ms` header get.
+            max_timeout (float): Max seconds a request can ask for via the header.
+        """
+        self.app = app
+        self.default_timeout = default_timeout
+        self.max_timeout = max_timeout
+
+    def request_budget(self, scope: Scope) -> float:
+        """Seconds the request has, from its header if valid else the default"""
+        header = REQUEST_TIMEOUT_HEADER.lower().encode("latin-1")
+        for name, value in scope["headers"]:
+            if name == header:
+                try:
+                    return min(max(int(value) / 1000, 0), self.max_timeout)
+                except ValueError:
+                    break
+        return self.default_timeout
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = self.request_budget(scope)
+        token = deadline_var.set(time.monotonic() + budget)
+
+        # Receive messages in a listener task, so a disconnect is seen while the handler is busy.
+        # The queue holds a single message, so request bodies are still read as the handler consumes them.
+        messages: asyncio.Queue = asyncio.Queue(maxsize=1)
+        disconnected = asyncio.Event()
+        response_started = False
+        response_complete = False
+
+        async def listen() -> None:
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    disconnected.set()
+                await messages.put(message)
+                if disconnected.is_set():
+                    return
+
+        async def receive_from_listener() -> Message:
+            if disconnected.is_set() and messages.empty():
+                return {"type": "http.disconnect"}
+            return await messages.get()
+
+        async def send_tracking(message: Message) -> None:
+            nonlocal response_started, response_complete
+            if message["type"] == "http.response.start":
+                response_started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        listener = asyncio.create_task(listen())
+        disconnect = asyncio.create_task(disconnected.wait())
+        handler = asyncio.create_task(self.app(scope, receive_from_listener, send_tracking))
+        deadline_var.reset(token)
+        try:
+            await asyncio.wait([handler, disconnect], timeout=budget, return_when=asyncio.FIRST_COMPLETED)
+
+            # Servers report a disconnect once the response is sent, let the handler finish (ex. background tasks)
+            if handler.done() or response_complete:
+                await handler
+                return
+
+            handler.cancel()
+            await asyncio.gather(handler, return_exceptions=True)
+            if disconnected.is_set():
+                logging.info(f"Client disconnected, cancelled request; path={scope['path']}")
+                return
+
+            logging.warning(f"Request deadline exceeded, cancelled request; path={scope['path']}; budget={budget}s")
+            if not response_started:
+                body = json.dumps({"detail": DEADLINE_EXCEEDED_DETAIL}).encode("utf-8")
+                headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+                await send(
+                    {"type": "http.response.start", "status": status.HTTP_504_GATEWAY_TIMEOUT, "headers": headers}
+                )
+                await send({"type": "http.response.body", "body": body})
+        finally:
+            for task in (handler, listener, disconnect):
+                task.cancel()
+        return
@@ -0,0 +1,149 @@
+"""Idempotency-Key support, so client retries of mutating requests replay the original response instead of redoing work.
+Used by `IdempotentAPIRoute` (see api/routers/core.py).
+docs: https://datatracker.ietf.org/doc/draft-ietf-httpapi-idempotency-key-header/
+"""
+import abc
+import asyncio
+import hashlib
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from utils.bounded_cache import BoundedTTLCache
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENT_REPLAY_HEADER = "Idempotent-Replayed"
+
+
+class StoredResponse(BaseModel):
+    """Final response of a request made with an idempotency key"""
+
+    request_hash: str
+    status_code: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+    def size(self) -> int:
+        """Approximate memory used by the response, in bytes"""
+        return len(self.body) + sum(len(k) + len(v) for k, v in self.headers)
+
+
+class IdempotencyStore(abc.ABC):
+    """Backend interface for storing responses by idempotency key.
+    Implement to share stored responses across instances (ex. Redis, Firestore)
+    """
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Optional[StoredResponse]:
+        """Get the stored response for a key, None if missing or expired"""
+
+    @abc.abstractmethod
+    async def set(self, key: str, response: StoredResponse, ttl: float) -> None:
+        """Store a response for a key for `ttl` seconds"""
+
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    """Per-instance store, bounded by number of keys and total response size"""
+
+    def __init__(self, max_items: int = 10000, max_bytes: int = 64 * 1024 * 1024):
+        self.cache = BoundedTTLCache(max_items=max_items, max_bytes=max_bytes, sizeof=StoredResponse.size)
+
+    async def get(self, key: str) -> Optional[StoredResponse]:
+        return self.cache.get(key)
+
+    async def set(self, key: str, response: StoredResponse, ttl: float) -> None:
+        if not self.cache.set(key, response, ttl=ttl):
+            logging.warning(f"Response for idempotency key too large to store; key={key}; size={response.size()}")
+        return
+
+
+# Requests currently executing per key, so concurrent retries wait for the first instead of running again
+_in_flight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+
+def scoped_key(request: Request, key: str, scope_headers: Tuple[str, ...]) -> str:
+    """Store key of an idempotency key, scoped to the route and the caller's credentials, so a different caller
+    reusing the same key doesn't get another caller's response replayed
+    """
+    scope = hashlib.sha256()
+    for header in scope_headers:
+        scope.update(request.headers.get(header, "").encode() + b"\n")
+    return f"{request.method}:{request.url.path}:{scope.hexdigest()}:{key}"
+
+
+def hash_request(request: Request, body: bytes) -> str:
+    """Hash of the parts of a request that must match when reusing an idempotency key"""
+    target = f"{request.method} {request.url.path}?{request.url.query}\n".encode()
+    return hashlib.sha256(target + body).hexdigest()
+
+
+def replay(stored: StoredResponse) -> Response:
+    """Rebuild a response from a stored one"""
+    response = Response(content=stored.body, status_code=stored.status_code)
+    response.raw_headers = stored.headers + [(IDEMPOTENT_REPLAY_HEADER.lower().encode(), b"true")]
+    return response
+
+
+def key_reuse_response() -> Response:
+    """Response for an idempotency key reused with a different request"""
+    return JSONResponse(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        content={"detail": f"{IDEMPOTENCY_KEY_HEADER} was already used with a different request"},
+    )
+
+
+async def run_once(
+    store: IdempotencyStore,
+    key: str,
+    request_hash: str,
+    call: Callable[[], Awaitable[Response]],
+    ttl: float,
+) -> Response:
+    """Run `call` at most once per key, replaying the stored response for retries with the same key.
+
+    Args:
+        store (IdempotencyStore): Store for final responses.
+        key (str): Idempotency key, should be scoped to the route.
+        request_hash (str): Hash of the request, retries must match it.
+        call (Callable): Runs the request handler.
+        ttl (float): Seconds to keep the response for.
+    """
+    stored = await store.get(key)
+    if stored:
+        return replay(stored) if stored.request_hash == request_hash else key_reuse_response()
+
+    in_flight = _in_flight.get(key)
+    if in_flight:
+        in_flight_hash, outcome = in_flight
+        if in_flight_hash != request_hash:
+            return key_reuse_response()
+
+        stored = await asyncio.shield(outcome)
+        if stored:
+            return replay(stored)
+        # First execution failed or wasn't storable, so this request runs it again
+        return await run_once(store, key, request_hash, call, ttl)
+
+    outcome = asyncio.get_running_loop().create_future()
+    _in_flight[key] = (request_hash, outcome)
+    stored = None
+    try:
+        response = await call()
+
+        # Server errors aren't stored so the client can retry, streamed bodies can't be stored
+        if response.status_code < 500 and hasattr(response, "body"):
+            stored = StoredResponse(
+                request_hash=request_hash,
+                status_code=response.status_code,
+                # Cookies set for the first request aren't replayed
+                headers=[(name, value) for name, value in response.raw_headers if name.lower() != b"set-cookie"],
+                body=response.body,
+            )
+            await store.set(key, stored, ttl=ttl)
+        return response
+    finally:
+        _in_flight.pop(key, None)
+        outcome.set_result(stored)
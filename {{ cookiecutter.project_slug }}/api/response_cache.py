@@ -0,0 +1,101 @@
+"""In-memory response caching for read routes, so repeated GETs of the same URL skip the handler until the TTL expires.
+Concurrent misses for the same key wait for the first request instead of all running the handler.
+Cache per route by using `CachedAPIRoute` as the route class, subclass it to change the TTL, size or varying headers.
+"""
+import asyncio
+import hashlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from api.routers.core import BaseAPIRoute
+from utils.bounded_cache import BoundedTTLCache
+from utils.metrics import register_stats
+
+CACHE_STATUS_HEADER = "X-Cache"
+
+
+class CachedResponse(BaseModel):
+    """Response stored in the cache"""
+
+    status_code: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+    def size(self) -> int:
+        """Approximate memory used by the response, in bytes"""
+        return len(self.body) + sum(len(k) + len(v) for k, v in self.headers)
+
+    def to_response(self) -> Response:
+        """Rebuild the response, marked as a cache hit"""
+        response = Response(content=self.body, status_code=self.status_code)
+        response.raw_headers = self.headers + [(CACHE_STATUS_HEADER.lower().encode(), b"HIT")]
+        return response
+
+
+def to_cached_response(response: Response) -> Optional[CachedResponse]:
+    """Cacheable copy of a response, None for non-200, streamed, cookie-setting or `no-store` responses"""
+    if response.status_code != 200 or not hasattr(response, "body"):
+        return None
+    if "set-cookie" in response.headers or "no-store" in response.headers.get("cache-control", ""):
+        return None
+    return CachedResponse(status_code=response.status_code, headers=response.raw_headers, body=response.body)
+
+
+def cache_key(request: Request, vary_headers: Tuple[str, ...]) -> str:
+    """Key of a request's URL and the values of headers its response varies by (ex. per caller credentials)"""
+    key = hashlib.sha256(f"{request.method} {request.url.path}?{sorted(request.query_params.multi_items())}".encode())
+    for header in vary_headers:
+        key.update(b"\n" + request.headers.get(header, "").encode())
+    return key.hexdigest()
+
+
+# Requests currently running per key, so concurrent misses wait for the first instead of all running the handler
+_in_flight: Dict[str, asyncio.Future] = {}
+
+
+class CachedAPIRoute(BaseAPIRoute):
+    """Serve GET responses from an in-memory cache for `cache_ttl` seconds, a `Cache-Control: no-cache` request
+    header bypasses the cache. Responses include an `X-Cache: HIT|MISS` header.
+    NOTE: cached per instance, so instances can serve different versions of a response until it expires.
+    """
+
+    response_cache = BoundedTTLCache(max_items=10000, max_bytes=64 * 1024 * 1024, sizeof=CachedResponse.size)
+    cache_ttl: float = 60
+    # Authorization is included so callers never receive responses cached for other credentials
+    vary_headers: Tuple[str, ...] = ("accept", "authorization")
+
+    def get_route_handler(self) -> Callable:
+        route_handler = super().get_route_handler()
+
+        async def cached_route_handler(request: Request) -> Response:
+            if request.method != "GET" or "no-cache" in request.headers.get("cache-control", ""):
+                return await route_handler(request)
+
+            key = cache_key(request, self.vary_headers)
+            cached = self.response_cache.get(key)
+            if cached is None and key in _in_flight:
+                cached = await asyncio.shield(_in_flight[key])
+            if cached is not None:
+                return cached.to_response()
+
+            future = asyncio.get_running_loop().create_future()
+            _in_flight[key] = future
+            try:
+                response = await route_handler(request)
+                cached = to_cached_response(response)
+                if cached is not None:
+                    self.response_cache.set(key, cached, ttl=self.cache_ttl)
+                    response.headers[CACHE_STATUS_HEADER] = "MISS"
+            finally:
+                # Waiting requests run the handler themselves if the response isn't cacheable or it raised
+                future.set_result(cached)
+                _in_flight.pop(key, None)
+
+            return response
+
+        return cached_route_handler
+
+
+register_stats("response_cache", CachedAPIRoute.response_cache.stats)
@@ -0,0 +1,188 @@
+"""Batch endpoint, running several sub-requests to this service in one round trip.
+Sub-requests are dispatched in-process through the app (including its middleware), concurrently up to a limit,
+so each keeps its own status code, deadline, request context and access log.
+
+Example request body:
+    {"requests": [{"id": "user", "method": "GET", "path": "/users/1"}, {"method": "POST", "path": "/orders",
+    "body": {"item": "book"}}]}
+"""
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from fastapi import APIRouter, Request
+from pydantic import BaseModel, Field
+from starlette.types import Message
+
+from api.deadline import deadline_headers
+from api.routers.core import BaseAPIRoute
+from config.service_config import SERVICE_CONFIG
+
+BATCH_ROUTE = "/batch"
+
+# Headers of the batch request passed on to sub-requests, ex. for auth and tracing
+FORWARDED_HEADERS = ("authorization", "cookie", "user-agent", "x-cloud-trace-context", "x-forwarded-for")
+
+# Sub-request headers that are ignored, so callers can't override forwarded headers (ex. spoof the client IP
+# logged from `x-forwarded-for`) or the framing of the in-process request
+IGNORED_SUB_REQUEST_HEADERS = FORWARDED_HEADERS + (
+    "connection",
+    "content-length",
+    "forwarded",
+    "host",
+    "transfer-encoding",
+    "x-forwarded-host",
+    "x-forwarded-proto",
+)
+
+router = APIRouter(tags=["batch"], route_class=BaseAPIRoute)
+
+
+class SubRequest(BaseModel):
+    """A request to run as part of a batch"""
+
+    id: Optional[str] = Field(description="Client ID of the sub-request, echoed in its response.", default=None)
+    method: str = Field(description="HTTP method.", default="GET")
+    path: str = Field(description="Path of a route on this service, ex. `/users/1?page=2`.", pattern=r"^/")
+    query: Dict[str, Any] = Field(
+        description="Query parameters, list values are repeated, added to any query string in `path`.",
+        default_factory=dict,
+    )
+    headers: Dict[str, str] = Field(
+        description="Headers, in addition to forwarded batch headers, which can't be overridden.",
+        default_factory=dict,
+    )
+    body: Any = Field(description="JSON body.", default=None)
+
+
+class SubResponse(BaseModel):
+    """Response of a sub-request"""
+
+    id: Optional[str] = None
+    status: int
+    # Pairs, so repeated headers (ex. `set-cookie`) are kept
+    headers: List[Tuple[str, str]] = Field(default_factory=list)
+    body: Any = None
+
+
+class BatchRequest(BaseModel):
+    """Sub-requests to run, responses are returned in the same order"""
+
+    requests: List[SubRequest] = Field(min_length=1, max_length=SERVICE_CONFIG.BATCH_MAX_REQUESTS)
+
+
+class BatchResponse(BaseModel):
+    """Sub-request responses, in the order of the batch's requests"""
+
+    responses: List[SubResponse]
+
+
+def split_path(sub_request: SubRequest) -> Tuple[str, bytes]:
+    """Path and query string of a sub-request, merging a query string in its path with its `query`"""
+    path, _, path_query = sub_request.path.partition("?")
+    query = parse_qsl(path_query, keep_blank_values=True) + [
+        (name, item)
+        for name, value in sub_request.query.items()
+        for item in (value if isinstance(value, list) else [value])
+    ]
+    return path, urlencode(query).encode("latin-1")
+
+
+def build_scope(request: Request, sub_request: SubRequest, body: bytes) -> dict:
+    """ASGI scope of a sub-request, based on the batch request's connection"""
+    path, query_string = split_path(sub_request)
+    headers = {
+        name.lower(): value
+        for name, value in sub_request.headers.items()
+        if name.lower() not in IGNORED_SUB_REQUEST_HEADERS
+    }
+    headers.update({name: value for name, value in request.headers.items() if name in FORWARDED_HEADERS})
+    # Sub-requests share the batch's remaining deadline (see api/deadline.py)
+    headers.update({name.lower(): value for name, value in deadline_headers().items()})
+    if body:
+        headers.update({"content-type": "application/json", "content-length": str(len(body))})
+
+    scope = {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": request.scope.get("http_version", "1.1"),
+        "method": sub_request.method.upper(),
+        "scheme": request.scope.get("scheme", "http"),
+        "path": path,
+        "raw_path": path.encode("utf-8"),
+        "root_path": request.scope.get("root_path", ""),
+        "query_string": query_string,
+        "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()],
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+    }
+    if "state" in request.scope:
+        # State set by the app lifespan
+        scope["state"] = request.scope["state"].copy()
+    return scope
+
+
+async def dispatch(request: Request, sub_request: SubRequest) -> SubResponse:
+    """Run a sub-request through the app in-process, returning its response"""
+    if split_path(sub_request)[0].rstrip("/") == BATCH_ROUTE:
+        return SubResponse(id=sub_request.id, status=400, body={"detail": "Batches can't be nested"})
+
+    body = b"" if sub_request.body is None else json.dumps(sub_request.body).encode("utf-8")
+    request_sent = False
+    response_start: Optional[Message] = None
+    response_body = bytearray()
+
+    async def receive() -> Message:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Sub-requests stay connected until the batch completes
+        await asyncio.Future()
+
+    async def send(message: Message) -> None:
+        nonlocal response_start
+        if message["type"] == "http.response.start":
+            response_start = message
+        elif message["type"] == "http.response.body":
+            response_body.extend(message.get("body", b""))
+
+    try:
+        await request.app(build_scope(request, sub_request, body), receive, send)
+    except Exception:  # pylint: disable=broad-except
+        # The app already responded 500 if it could, the error is logged here instead of by the server
+        logging.exception(f"Batch sub-request failed; method={sub_request.method}; path={sub_request.path}")
+
+    if response_start is None:
+        return SubResponse(id=sub_request.id, status=500, body={"detail": "Internal Server Error"})
+
+    headers = [
+        (name.decode("latin-1"), value.decode("latin-1"))
+        for name, value in response_start.get("headers", [])
+        if name.lower() != b"content-length"
+    ]
+    content_type = next((value for name, value in headers if name.lower() == "content-type"), "")
+    content = bytes(response_body)
+    decoded = content.decode("utf-8", errors="replace")
+    if content_type.startswith("application/json") and content:
+        try:
+            decoded = json.loads(content)
+        except ValueError:
+            # Malformed JSON is returned as text rather than failing the batch
+            pass
+    return SubResponse(id=sub_request.id, status=response_start["status"], headers=headers, body=decoded)
+
+
+@router.post(BATCH_ROUTE, response_model=BatchResponse)
+async def batch(request: Request, batch_request: BatchRequest):
+    """Run sub-requests concurrently (up to `BATCH_MAX_CONCURRENCY` at a time), returning each one's response"""
+    semaphore = asyncio.Semaphore(SERVICE_CONFIG.BATCH_MAX_CONCURRENCY)
+
+    async def dispatch_limited(sub_request: SubRequest) -> SubResponse:
+        async with semaphore:
+            return await dispatch(request, sub_request)
+
+    responses = await asyncio.gather(*(dispatch_limited(sub_request) for sub_request in batch_request.requests))
+    return BatchResponse(responses=responses)
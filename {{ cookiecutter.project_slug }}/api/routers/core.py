@@ -1,27 +1,152 @@
 """Core APIRoute clases, can inherit from these modified APIRoutes for specific added functionality"""
+import asyncio
 import logging
-from typing import Callable
+from functools import lru_cache
+from typing import Any, Callable, Optional, Tuple
 
 from fastapi import Request, Response
 from fastapi.routing import APIRoute
+from pydantic import BaseModel, TypeAdapter
+
+from api.deadline import run_with_timeout
+from api.idempotency import (
+    IDEMPOTENCY_KEY_HEADER,
+    IdempotencyStore,
+    InMemoryIdempotencyStore,
+    hash_request,
+    run_once,
+    scoped_key,
+)
 
 
 class BaseAPIRoute(APIRoute):
-    """Log inbound HTTP Request data"""
+    """Log inbound HTTP Request data at debug level, and cancel the handler after `request_timeout` seconds if set.
+    Every request is also logged once it completes by AccessLogMiddleware (see config/logging_utils.py).
+    """
+
+    # Whether to read and debug log the full request body, disabled for streaming routes
+    log_request_body: bool = True
+    # Seconds the handler may run (capped at the request's deadline, see api/deadline.py), responding 504 after
+    request_timeout: Optional[float] = None
 
     def get_route_handler(self) -> Callable:
         original_route_handler = super().get_route_handler()
 
         async def custom_route_handler(request: Request) -> Response:
-            # FastAPI has no global request context, using env vars to store
-            req_body = await request.body()
+            if logging.root.isEnabledFor(logging.DEBUG):
+                req_body = await request.body() if self.log_request_body else b"<streamed>"
+                logging.debug(
+                    f"{request.method} Request; URL={request.url}; headers={request.headers}; body={req_body}"
+                )
 
-            logging.info(
-                f"{request.method} Request; URL={request.base_url}; headers={request.headers}; body={req_body}"
-            )
-
-            response = await original_route_handler(request)
+            if self.request_timeout is None:
+                response = await original_route_handler(request)
+            else:
+                response = await run_with_timeout(lambda: original_route_handler(request), self.request_timeout)
 
             return response
 
         return custom_route_handler
+
+
+class StreamingAPIRoute(BaseAPIRoute):
+    """Log inbound HTTP Request data without reading the body, so handlers can consume it incrementally.
+    Use with the helpers in api/streaming.py, ex. `async for record in iter_ndjson(request): ...`
+    """
+
+    log_request_body = False
+
+
+class IdempotentAPIRoute(BaseAPIRoute):
+    """Honor an `Idempotency-Key` header on mutating requests, replaying the stored response for retries of a key.
+    Concurrent requests with the same key wait for the first to finish, a reused key with a different body is rejected.
+    Keys are scoped per caller by the `idempotency_scope_headers` credentials.
+    Subclass to change the store (ex. a shared backend) or TTL, see api/idempotency.py.
+    """
+
+    idempotency_store: IdempotencyStore = InMemoryIdempotencyStore()
+    idempotency_ttl: float = 24 * 60 * 60
+    idempotent_methods = frozenset({"POST", "PATCH"})
+    idempotency_scope_headers: Tuple[str, ...] = ("authorization", "cookie")
+
+    def get_route_handler(self) -> Callable:
+        route_handler = super().get_route_handler()
+
+        async def idempotent_route_handler(request: Request) -> Response:
+            key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+            if not key or request.method not in self.idempotent_methods:
+                return await route_handler(request)
+
+            request_hash = hash_request(request, await request.body())
+
+            return await run_once(
+                store=self.idempotency_store,
+                key=scoped_key(request, key, self.idempotency_scope_headers),
+                request_hash=request_hash,
+                call=lambda: route_handler(request),
+                ttl=self.idempotency_ttl,
+            )
+
+        return idempotent_route_handler
+
+
+@lru_cache(maxsize=None)
+def get_type_adapter(annotation: Any) -> TypeAdapter:
+    """Cached TypeAdapter per type, building one is much slower than using it"""
+    return TypeAdapter(annotation)
+
+
+def is_trusted_output(content: Any) -> bool:
+    """True if content is already validated pydantic model(s), so re-validating it is redundant"""
+    if isinstance(content, BaseModel):
+        return True
+    if isinstance(content, (list, tuple)):
+        return all(isinstance(item, BaseModel) for item in content)
+    return False
+
+
+class FastResponseAPIRoute(BaseAPIRoute):
+    """Serialize pydantic model outputs straight to JSON bytes via a cached TypeAdapter of the `response_model`,
+    skipping FastAPI's re-validation and intermediate dict / json.dumps steps. The OpenAPI schema is unchanged.
+    Any other return values (ex. dicts) fall back to FastAPI's default validation.
+    NOTE: headers / status codes set on an injected `Response` parameter are not applied to fast responses.
+    """
+
+    def get_route_handler(self) -> Callable:
+        if self.response_model and not getattr(self.dependant.call, "_fast_response", False):
+            self.dependant.call = self._wrap_endpoint(self.dependant.call)
+        return super().get_route_handler()
+
+    def _wrap_endpoint(self, endpoint: Callable) -> Callable:
+        adapter = get_type_adapter(self.response_model)
+        status_code = self.status_code or 200
+        dump_kwargs = {
+            "include": self.response_model_include,
+            "exclude": self.response_model_exclude,
+            "by_alias": self.response_model_by_alias,
+            "exclude_unset": self.response_model_exclude_unset,
+            "exclude_defaults": self.response_model_exclude_defaults,
+            "exclude_none": self.response_model_exclude_none,
+        }
+
+        def to_response(content: Any) -> Any:
+            if not is_trusted_output(content):
+                return content
+            return Response(
+                content=adapter.dump_json(content, **dump_kwargs),
+                status_code=status_code,
+                media_type="application/json",
+            )
+
+        if asyncio.iscoroutinefunction(endpoint):
+
+            async def fast_endpoint(*args, **kwargs):
+                return to_response(await endpoint(*args, **kwargs))
+
+        else:
+
+            def fast_endpoint(*args, **kwargs):
+                return to_response(endpoint(*args, **kwargs))
+
+        fast_endpoint._fast_response = True  # pylint: disable=protected-access
+        return fast_endpoint
@@ -1,7 +1,9 @@
-"""Health check endpoint."""
-from fastapi import APIRouter
+"""Health check and readiness endpoints."""
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
 
 from api.routers.core import BaseAPIRoute
+from api.shutdown import shutdown_coordinator
 from config.service_config import SERVICE_CONFIG
 
 router = APIRouter(tags=["healthcheck"], route_class=BaseAPIRoute)
@@ -11,3 +13,14 @@ router = APIRouter(tags=["healthcheck"], route_class=BaseAPIRoute)
 def healthcheck():
     """Health Check Endpoint"""
     return {"message": "Service is up", "status": "OK"}
+
+
+@router.get(SERVICE_CONFIG.READINESS_ROUTE)
+def readiness():
+    """Readiness Check Endpoint, returns 503 once the instance received SIGTERM and is draining requests"""
+    if shutdown_coordinator.draining:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"message": "Service is shutting down", "status": "DRAINING"},
+        )
+    return {"message": "Service is ready", "status": "OK"}
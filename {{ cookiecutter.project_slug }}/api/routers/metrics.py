@@ -0,0 +1,59 @@
+"""Request metrics middleware, and an endpoint returning all in-process stats (see utils/metrics.py)."""
+import time
+from collections import Counter, defaultdict
+
+from fastapi import APIRouter
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.routers.core import BaseAPIRoute
+from utils.metrics import SampleWindow, collect_stats, register_stats
+
+router = APIRouter(tags=["metrics"], route_class=BaseAPIRoute)
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware counting responses by status class and tracking latency percentiles per route.
+    Latency is keyed by the route's path template, so memory is bounded by the number of routes.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.latency = defaultdict(SampleWindow)
+        self.status_counts = Counter()
+        register_stats("requests", self.stats)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            self.latency[f"{scope['method']} {route.path if route else '<unmatched>'}"].add(time.perf_counter() - start)
+            self.status_counts[f"{status_code // 100}xx"] += 1
+        return
+
+    def stats(self) -> dict:
+        """Response counts by status class and latency percentiles (in milliseconds) per route"""
+        latency_ms = {
+            route: {k: round(v * 1000, 3) if v is not None else None for k, v in window.percentiles().items()}
+            for route, window in list(self.latency.items())
+        }
+        return {"status_counts": dict(self.status_counts), "latency_ms": latency_ms}
+
+
+@router.get("/metrics")
+def metrics():
+    """In-process stats from all registered providers (ex. request latency, event loop lag, cache hit ratios)"""
+    return collect_stats()
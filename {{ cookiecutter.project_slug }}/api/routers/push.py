@@ -0,0 +1,287 @@
+"""Router for Cloud Tasks and Pub/Sub push handlers.
+Decodes push envelopes, drops redeliveries of already processed messages, optionally micro-batches messages,
+and returns the status codes push senders use to ack (2xx) or retry (anything else) a delivery.
+
+Example:
+    router = PushHandlerRouter(prefix="/push", tags=["push"])
+
+    @router.pubsub("/orders")
+    async def handle_order(message: PushMessage):
+        ...
+
+    @router.cloud_tasks("/reports", batch_max_size=50, batch_max_wait=0.5)
+    async def handle_reports(messages: List[PushMessage]):
+        ...  # optionally return the message IDs that failed, to retry only those
+"""
+import asyncio
+import base64
+import binascii
+import json
+import logging
+from enum import Enum
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Union,
+)
+
+from fastapi import APIRouter, Request, Response, status
+from pydantic import BaseModel, Field
+
+from api.routers.core import BaseAPIRoute
+from utils.batching import MicroBatcher
+from utils.bounded_cache import BoundedTTLCache
+from utils.metrics import register_stats
+
+
+class PushSource(str, Enum):
+    """Push message sources"""
+
+    PUBSUB = "pubsub"
+    CLOUD_TASKS = "cloud_tasks"
+
+
+class PushMessage(BaseModel):
+    """A decoded push delivery"""
+
+    id: str = Field(description="Pub/Sub message ID or Cloud Tasks task name.")
+    source: PushSource
+    data: bytes = Field(description="Decoded message data / task body.", default=b"")
+    attributes: Dict[str, str] = Field(description="Pub/Sub message attributes.", default_factory=dict)
+    delivery_attempt: int = Field(description="1 for the first delivery, incremented on each retry.", default=1)
+    origin: Optional[str] = Field(description="Pub/Sub subscription or Cloud Tasks queue name.", default=None)
+
+    def json_data(self) -> Any:
+        """Parse data as JSON"""
+        return json.loads(self.data)
+
+
+def decode_pubsub_push(headers: Mapping[str, str], body: bytes) -> PushMessage:
+    """Decode a Pub/Sub push request. docs: https://cloud.google.com/pubsub/docs/push#receive_push
+
+    Raises:
+        ValueError: If the envelope is malformed.
+    """
+    try:
+        envelope = json.loads(body)
+        message = envelope["message"] if isinstance(envelope, dict) else None
+        if not isinstance(message, dict):
+            raise TypeError(f"Expected a message object, got {type(message).__name__}")
+        return PushMessage(
+            id=message.get("messageId") or message["message_id"],
+            source=PushSource.PUBSUB,
+            data=base64.b64decode(message.get("data", ""), validate=True),
+            attributes=message.get("attributes") or {},
+            delivery_attempt=envelope.get("deliveryAttempt") or 1,
+            origin=envelope.get("subscription"),
+        )
+    except (KeyError, TypeError, ValueError, binascii.Error) as exc:
+        # ValueError covers invalid JSON and PushMessage validation errors
+        raise ValueError(f"Malformed Pub/Sub push envelope: {exc!r}") from exc
+
+
+def decode_cloud_tasks_push(headers: Mapping[str, str], body: bytes) -> PushMessage:
+    """Decode a Cloud Tasks HTTP or App Engine target request.
+    docs: https://cloud.google.com/tasks/docs/creating-http-target-tasks#handler
+
+    Raises:
+        ValueError: If the task headers are missing.
+    """
+    task_name = headers.get("X-CloudTasks-TaskName") or headers.get("X-AppEngine-TaskName")
+    if not task_name:
+        raise ValueError("Missing Cloud Tasks task name header")
+
+    retry_count = headers.get("X-CloudTasks-TaskRetryCount") or headers.get("X-AppEngine-TaskRetryCount") or 0
+
+    return PushMessage(
+        id=task_name,
+        source=PushSource.CLOUD_TASKS,
+        data=body,
+        delivery_attempt=int(retry_count) + 1,
+        origin=headers.get("X-CloudTasks-QueueName") or headers.get("X-AppEngine-QueueName"),
+    )
+
+
+def build_pubsub_envelope(
+    data: Union[bytes, str, dict],
+    message_id: str,
+    attributes: Optional[Dict[str, str]] = None,
+    subscription: str = "projects/local/subscriptions/local",
+    delivery_attempt: int = 1,
+) -> dict:
+    """Build a Pub/Sub push envelope, for local testing"""
+    if isinstance(data, dict):
+        data = json.dumps(data)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+
+    return {
+        "message": {
+            "data": base64.b64encode(data).decode("ascii"),
+            "attributes": attributes or {},
+            "messageId": message_id,
+            "publishTime": "2023-01-01T00:00:00Z",
+        },
+        "subscription": subscription,
+        "deliveryAttempt": delivery_attempt,
+    }
+
+
+def build_cloud_tasks_headers(task_name: str, queue_name: str = "local", retry_count: int = 0) -> Dict[str, str]:
+    """Build the headers Cloud Tasks sets on HTTP target requests, for local testing"""
+    return {
+        "X-CloudTasks-TaskName": task_name,
+        "X-CloudTasks-QueueName": queue_name,
+        "X-CloudTasks-TaskRetryCount": str(retry_count),
+    }
+
+
+class PushHandlerRouter(APIRouter):
+    """APIRouter with decorators to register Pub/Sub and Cloud Tasks push handlers.
+    Messages are deduplicated on source and ID across all of the router's handlers.
+    """
+
+    def __init__(
+        self,
+        *args,
+        dedupe_max_items: int = 10000,
+        dedupe_ttl: float = 3600,
+        stats_name: str = "push_handlers",
+        **kwargs,
+    ):
+        """
+        Args:
+            dedupe_max_items (int): Max number of processed message IDs to remember.
+            dedupe_ttl (float): Seconds to remember a processed message ID for.
+            stats_name (str): Name to register the router's stats under, see utils/metrics.py.
+        """
+        kwargs.setdefault("route_class", BaseAPIRoute)
+        super().__init__(*args, **kwargs)
+
+        self.processed_ids = BoundedTTLCache(max_items=dedupe_max_items, ttl=dedupe_ttl)
+        self.counters = {"received": 0, "acked": 0, "duplicates": 0, "retried": 0, "invalid": 0}
+        self.batchers: List[MicroBatcher] = []
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+        register_stats(stats_name, self.stats)
+
+    def pubsub(self, path: str, batch_max_size: Optional[int] = None, batch_max_wait: float = 0.05, **kwargs):
+        """Register a Pub/Sub push handler, see `add_push_route`"""
+        return self._push_decorator(path, decode_pubsub_push, batch_max_size, batch_max_wait, **kwargs)
+
+    def cloud_tasks(self, path: str, batch_max_size: Optional[int] = None, batch_max_wait: float = 0.05, **kwargs):
+        """Register a Cloud Tasks push handler, see `add_push_route`"""
+        return self._push_decorator(path, decode_cloud_tasks_push, batch_max_size, batch_max_wait, **kwargs)
+
+    def add_push_route(
+        self,
+        path: str,
+        handler: Callable[..., Awaitable[Any]],
+        decoder: Callable[[Mapping[str, str], bytes], PushMessage],
+        batch_max_size: Optional[int] = None,
+        batch_max_wait: float = 0.05,
+        **kwargs,
+    ) -> None:
+        """Add a POST route decoding push requests and passing them to `handler`.
+
+        Args:
+            path (str): Route path.
+            handler (Callable): Called with a single `PushMessage`, or if batching a list of them.
+                Batch handlers can return the IDs of messages that failed so only those are retried.
+                Raise to have the delivery (or whole batch) retried.
+            decoder (Callable): Function decoding request headers and body to a `PushMessage`.
+            batch_max_size (Optional[int]): Enables micro-batching, max number of messages per batch.
+            batch_max_wait (float): Max seconds to wait for a batch to fill up before processing it.
+            kwargs: Passed to `APIRouter.add_api_route`.
+        """
+        process = handler
+        if batch_max_size:
+            process = self._add_batcher(handler, batch_max_size, batch_max_wait).submit
+
+        async def push_endpoint(request: Request) -> Response:
+            self.counters["received"] += 1
+            try:
+                message = decoder(request.headers, await request.body())
+            except ValueError:
+                # Not acked, so it ends up in the dead letter queue (if configured) after max retries
+                logging.exception("Invalid push request")
+                self.counters["invalid"] += 1
+                return Response(status_code=status.HTTP_400_BAD_REQUEST)
+
+            acked = await self._process_once(message, process)
+            return Response(status_code=status.HTTP_204_NO_CONTENT if acked else status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        kwargs.setdefault("name", handler.__name__)
+        kwargs.setdefault("description", handler.__doc__)
+        kwargs.setdefault("status_code", status.HTTP_204_NO_CONTENT)
+        self.add_api_route(path, push_endpoint, methods=["POST"], **kwargs)
+        return
+
+    async def flush(self) -> None:
+        """Process any pending batched messages, ex. on shutdown"""
+        await asyncio.gather(*(batcher.flush() for batcher in self.batchers))
+        return
+
+    def stats(self) -> dict:
+        """Push delivery counters and dedupe cache stats"""
+        return {
+            **self.counters,
+            "batches": sum(batcher.batches for batcher in self.batchers),
+            "dedupe_cache": self.processed_ids.stats(),
+        }
+
+    def _push_decorator(self, path, decoder, batch_max_size, batch_max_wait, **kwargs):
+        def decorator(handler):
+            self.add_push_route(path, handler, decoder, batch_max_size, batch_max_wait, **kwargs)
+            return handler
+
+        return decorator
+
+    def _add_batcher(self, handler: Callable, max_size: int, max_wait: float) -> MicroBatcher:
+        async def batch_handler(messages: List[PushMessage]) -> Iterable[int]:
+            failed_ids = set(await handler(messages) or ())
+            return [i for i, message in enumerate(messages) if message.id in failed_ids]
+
+        batcher = MicroBatcher(batch_handler, max_size=max_size, max_wait=max_wait)
+        self.batchers.append(batcher)
+        return batcher
+
+    async def _process_once(self, message: PushMessage, process: Callable[[PushMessage], Awaitable[Any]]) -> bool:
+        """Process a message unless it was already processed, returns True if the delivery should be acked"""
+        key = f"{message.source.value}:{message.id}"
+
+        if key in self.processed_ids:
+            logging.info(f"Dropping duplicate push delivery; id={message.id}; attempt={message.delivery_attempt}")
+            self.counters["duplicates"] += 1
+            return True
+
+        # A concurrent redelivery of a message still being processed gets the same outcome
+        in_flight = self._in_flight.get(key)
+        if in_flight:
+            self.counters["duplicates"] += 1
+            return await asyncio.shield(in_flight)
+
+        outcome = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = outcome
+        try:
+            await process(message)
+        except Exception:  # pylint: disable=broad-except
+            logging.exception(f"Push handler failed, will be retried; id={message.id}")
+            self.counters["retried"] += 1
+            outcome.set_result(False)
+        else:
+            self.processed_ids.set(key, True)
+            self.counters["acked"] += 1
+            outcome.set_result(True)
+        finally:
+            if not outcome.done():
+                outcome.set_result(False)
+            self._in_flight.pop(key, None)
+
+        return outcome.result()
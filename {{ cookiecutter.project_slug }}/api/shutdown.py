@@ -0,0 +1,108 @@
+"""Graceful shutdown, so requests in progress when Cloud Run stops an instance (scale down, new revision) finish.
+On SIGTERM the readiness check starts returning 503 and in-flight requests get up to `SHUTDOWN_GRACE_PERIOD_S` to
+finish, then the server's own shutdown runs and the app lifespan closes service-wide resources (see main.py).
+Cloud Run sends SIGKILL 10 seconds after SIGTERM, keep the grace period and the lifespan shutdown within that.
+"""
+import asyncio
+import logging
+import signal
+from typing import Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class ShutdownCoordinator:
+    """Tracks in-flight requests, and on SIGTERM waits for them before handing over to the server's shutdown"""
+
+    # Signal raised once drained to start the server's shutdown (servers handle SIGINT like SIGTERM),
+    # None if the server instead awaits `wait_drained` (see config/server.py)
+    handover_signal: Optional[signal.Signals] = signal.SIGINT
+
+    def __init__(self):
+        self.in_flight = 0
+        self.draining = False
+        self.grace_period: float = 8
+        self._idle: Optional[asyncio.Event] = None
+        self._drained: Optional[asyncio.Event] = None
+        self._drain_task: Optional[asyncio.Task] = None
+
+    def install(self, grace_period: float) -> None:
+        """Handle SIGTERM by draining, call from the app lifespan (after the server installed its signal handlers).
+
+        Args:
+            grace_period (float): Max seconds to wait for in-flight requests after SIGTERM.
+        """
+        self.grace_period = grace_period
+        self.draining = False
+        self._idle = asyncio.Event()
+        self._drained = asyncio.Event()
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self.start_drain)
+        except (NotImplementedError, RuntimeError, ValueError):
+            # Signals can only be handled in the main thread, ex. not when run by the test client
+            logging.debug("SIGTERM handler not installed, not running in the main thread")
+        return
+
+    def start_drain(self) -> None:
+        """Stop reporting ready and start waiting for in-flight requests, called on SIGTERM"""
+        if self.draining:
+            return
+        self.draining = True
+        logging.info(f"SIGTERM received, draining; in_flight={self.in_flight}; grace_period={self.grace_period}s")
+        self._drain_task = asyncio.get_running_loop().create_task(self._drain())
+        return
+
+    async def _drain(self) -> None:
+        if self.in_flight:
+            try:
+                await asyncio.wait_for(self._idle.wait(), self.grace_period)
+            except asyncio.TimeoutError:
+                logging.warning(f"Shutdown grace period ended with requests in flight; in_flight={self.in_flight}")
+        logging.info("Drained, shutting down")
+
+        # The server stops accepting connections and runs the lifespan shutdown
+        self._drained.set()
+        if self.handover_signal is not None:
+            signal.raise_signal(self.handover_signal)
+        return
+
+    async def wait_drained(self) -> None:
+        """Wait until SIGTERM was received and in-flight requests drained, ex. as a server's shutdown trigger"""
+        await self._drained.wait()
+        return
+
+    def request_started(self) -> None:
+        """Count a request as in flight"""
+        self.in_flight += 1
+        return
+
+    def request_finished(self) -> None:
+        """Count a request as done, releasing the drain once the last one finishes"""
+        self.in_flight -= 1
+        if self.in_flight == 0 and self.draining and self._idle is not None:
+            self._idle.set()
+        return
+
+
+# Service-wide coordinator, installed in the app lifespan (see main.py)
+shutdown_coordinator = ShutdownCoordinator()
+
+
+class InFlightMiddleware:
+    """ASGI middleware counting in-flight requests, add last so it's the outermost middleware"""
+
+    def __init__(self, app: ASGIApp, coordinator: ShutdownCoordinator = shutdown_coordinator):
+        self.app = app
+        self.coordinator = coordinator
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        self.coordinator.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.coordinator.request_finished()
+        return
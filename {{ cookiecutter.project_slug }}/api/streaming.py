@@ -0,0 +1,160 @@
+"""Helpers for streaming request bodies in, and NDJSON / JSON array responses out, without buffering whole payloads.
+
+Request chunks are pulled from the ASGI server only as they're consumed, so a slow consumer applies backpressure
+to the client (the server stops reading from the socket once its buffer is full).
+Use with `StreamingAPIRoute` (see api/routers/core.py) so the route class doesn't read the whole body for debug logs.
+"""
+{%- if cookiecutter.json_backend == "stdlib" %}
+import json
+{%- endif %}
+from typing import Any, AsyncIterable, AsyncIterator, Optional, Type
+
+{% if cookiecutter.json_backend == "orjson" %}import orjson
+{% endif %}from fastapi import HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Max bytes allowed for a single NDJSON record, guards against unbounded buffering of a line with no newline
+DEFAULT_MAX_RECORD_BYTES = 1024 * 1024
+
+# Serialized output is buffered up to this size before being sent, to avoid a send() per small item
+DEFAULT_FLUSH_BYTES = 64 * 1024
+
+
+async def iter_request_chunks(request: Request) -> AsyncIterator[bytes]:
+    """Iterate over the raw request body chunks as they arrive"""
+    async for chunk in request.stream():
+        if chunk:
+            yield chunk
+
+
+async def iter_ndjson(
+    request: Request,
+    model: Optional[Type[Any]] = None,
+    max_record_bytes: int = DEFAULT_MAX_RECORD_BYTES,
+) -> AsyncIterator[Any]:
+    """Iterate over the parsed records of a newline-delimited JSON request body.
+
+    Args:
+        request (Request): Inbound request.
+        model (Optional[Type[Any]], optional): Type to validate each record as (ex. a pydantic model). Defaults to None.
+        max_record_bytes (int, optional): Max size of a single record. Defaults to DEFAULT_MAX_RECORD_BYTES.
+
+    Raises:
+        HTTPException: 413 if a record exceeds `max_record_bytes`, 400/422 if a record is not valid JSON / invalid.
+    """
+    adapter = TypeAdapter(model) if model is not None else None
+    # bytearray appends in place, so a large body isn't copied on every chunk
+    buffer = bytearray()
+    line_number = 0
+
+    async for chunk in iter_request_chunks(request):
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end == -1:
+                break
+            line_number += 1
+            _check_record_size(end - start, line_number, max_record_bytes)
+            record = _parse_ndjson_line(bytes(buffer[start:end]), line_number, adapter)
+            start = end + 1
+            if record is not None:
+                yield record
+        del buffer[:start]
+        _check_record_size(len(buffer), line_number + 1, max_record_bytes)
+
+    # Last record may not be newline terminated
+    record = _parse_ndjson_line(bytes(buffer), line_number + 1, adapter)
+    if record is not None:
+        yield record
+
+
+def _check_record_size(size: int, line_number: int, max_record_bytes: int) -> None:
+    if size > max_record_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"NDJSON record at line {line_number} exceeds {max_record_bytes} bytes",
+        )
+    return
+
+
+def _parse_ndjson_line(line: bytes, line_number: int, adapter: Optional[TypeAdapter]) -> Any:
+    if not line.strip():
+        return None
+
+    try:
+        if adapter:
+            return adapter.validate_json(line)
+{%- if cookiecutter.json_backend == "orjson" %}
+        return orjson.loads(line)
+{%- else %}
+        return json.loads(line)
+{%- endif %}
+    except ValidationError as exc:
+        if exc.errors()[0]["type"] == "json_invalid":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON at NDJSON line {line_number}"
+            ) from exc
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"line": line_number, "errors": jsonable_encoder(exc.errors())},
+        ) from exc
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON at NDJSON line {line_number}: {exc}"
+        ) from exc
+
+
+def serialize_item(item: Any) -> bytes:
+    """Serialize a single item to JSON bytes, using pydantic's serializer for models"""
+    if isinstance(item, BaseModel):
+        return item.model_dump_json().encode("utf-8")
+{%- if cookiecutter.json_backend == "orjson" %}
+    return orjson.dumps(jsonable_encoder(item))
+{%- else %}
+    return json.dumps(jsonable_encoder(item), separators=(",", ":")).encode("utf-8")
+{%- endif %}
+
+
+async def _buffered(chunks: AsyncIterable[bytes], flush_bytes: int) -> AsyncIterator[bytes]:
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= flush_bytes:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+async def _ndjson_chunks(items: AsyncIterable[Any]) -> AsyncIterator[bytes]:
+    async for item in items:
+        yield serialize_item(item) + b"\n"
+
+
+async def _json_array_chunks(items: AsyncIterable[Any]) -> AsyncIterator[bytes]:
+    separator = b"["
+    async for item in items:
+        yield separator + serialize_item(item)
+        separator = b","
+    yield b"[]" if separator == b"[" else b"]"
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """Stream items from an async iterable as newline-delimited JSON, serializing each item as it's produced"""
+
+    def __init__(self, items: AsyncIterable[Any], flush_bytes: int = DEFAULT_FLUSH_BYTES, **kwargs):
+        kwargs.setdefault("media_type", NDJSON_MEDIA_TYPE)
+        super().__init__(_buffered(_ndjson_chunks(items), flush_bytes), **kwargs)
+
+
+class JSONArrayStreamingResponse(StreamingResponse):
+    """Stream items from an async iterable as a single JSON array, serializing each item as it's produced"""
+
+    def __init__(self, items: AsyncIterable[Any], flush_bytes: int = DEFAULT_FLUSH_BYTES, **kwargs):
+        kwargs.setdefault("media_type", "application/json")
+        super().__init__(_buffered(_json_array_chunks(items), flush_bytes), **kwargs)
@@ -0,0 +1,56 @@
+"""Helper to call an ASGI app in-process for benchmarks, so results aren't skewed by network / client overhead"""
+import asyncio
+from typing import Iterable, List, Optional, Tuple
+
+
+async def call_app(
+    app,
+    method: str,
+    path: str,
+    query: str = "",
+    body_chunks: Iterable[bytes] = (),
+    headers: Optional[List[Tuple[bytes, bytes]]] = None,
+) -> Tuple[int, int]:
+    """Call an ASGI app directly, streaming the request body from `body_chunks`.
+    Returns the response status code and body size, the body itself is discarded.
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"bench")] + (headers or []),
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+    chunks = iter(body_chunks)
+    body_complete = False
+    status_code = 0
+    response_size = 0
+    response_done = asyncio.Event()
+
+    async def receive():
+        nonlocal body_complete
+        if not body_complete:
+            chunk = next(chunks, None)
+            body_complete = chunk is None
+            return {"type": "http.request", "body": chunk or b"", "more_body": not body_complete}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status_code, response_size
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+        elif message["type"] == "http.response.body":
+            response_size += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_done.set()
+
+    await app(scope, receive, send)
+    return status_code, response_size
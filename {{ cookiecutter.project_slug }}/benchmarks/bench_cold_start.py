@@ -0,0 +1,112 @@
+"""Measure container-free cold start, from process spawn to the first 200 response, for two layouts of the service:
+- `source`: the full source tree without bytecode, as deployed from source via buildpacks, compiled on every start.
+- `runtime`: the Dockerfile layout without tests / benchmarks / CLI, with precompiled bytecode and a static OpenAPI doc.
+
+Run: `python cli/main.py benchmark bench_cold_start --runs 5`
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICE_CONFIG_FILE = "config/service_configs/local.env"
+
+# Mirrors .dockerignore for the runtime layout
+ALWAYS_IGNORED = ["__pycache__", "*.py[cod]", ".git", "venv", ".venv", "build", ".pytest_cache", ".coverage"]
+RUNTIME_IGNORED = ALWAYS_IGNORED + ["tests", "benchmarks", "cli", "requirements-dev.txt", "htmlcov"]
+
+
+def dir_size_mb(path: str) -> float:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files) / 1024 / 1024
+
+
+def prepare_layouts(temp_dir: str) -> dict:
+    """Copy the project into a `source` and `runtime` layout, returns paths keyed by layout name"""
+    source_dir = shutil.copytree(
+        PROJECT_ROOT, os.path.join(temp_dir, "source"), ignore=shutil.ignore_patterns(*ALWAYS_IGNORED)
+    )
+    runtime_dir = shutil.copytree(
+        PROJECT_ROOT, os.path.join(temp_dir, "runtime"), ignore=shutil.ignore_patterns(*RUNTIME_IGNORED)
+    )
+
+    # Same build steps as the Dockerfile
+    os.makedirs(os.path.join(runtime_dir, "build"))
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import json, main; json.dump(main.app.openapi(), open('build/openapi.json', 'w'))",
+        ],
+        cwd=runtime_dir,
+        env={**os.environ, "SERVICE_CONFIG_FILE": SERVICE_CONFIG_FILE},
+        check=True,
+        capture_output=True,
+    )
+    shutil.rmtree(os.path.join(runtime_dir, "__pycache__"), ignore_errors=True)
+    subprocess.run(
+        [sys.executable, "-m", "compileall", "-q", "--invalidation-mode", "unchecked-hash", runtime_dir], check=True
+    )
+    return {"source": source_dir, "runtime": runtime_dir}
+
+
+def time_to_first_200(layout: str, layout_dir: str, port: int, path: str) -> float:
+    """Seconds from spawning the server process until `path` first responds with a 200"""
+    env = {
+        **os.environ,
+        "SERVICE_CONFIG_FILE": SERVICE_CONFIG_FILE,
+        "PORT": str(port),
+        "LOG_LEVEL": "WARNING",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    }
+    if layout == "runtime":
+        env["OPENAPI_SCHEMA_FILE"] = "build/openapi.json"
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "config.server"],
+        cwd=layout_dir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < 30:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}{path}", timeout=5).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                time.sleep(0.005)
+        raise RuntimeError(f"{layout} layout did not respond on {path} within 30s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold starts per layout, the median is reported")
+    parser.add_argument("--port", type=int, default=8092, help="Local port to run the service on")
+    parser.add_argument("--path", default="/openapi.json", help="Path of the first request")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        layouts = prepare_layouts(temp_dir)
+
+        print(f"{'layout':<10}{'size_mb':>10}{'median_cold_start_ms':>24}{'min_ms':>10}")
+        for layout, layout_dir in layouts.items():
+            timings = [time_to_first_200(layout, layout_dir, args.port, args.path) for _ in range(args.runs)]
+            print(
+                f"{layout:<10}{dir_size_mb(layout_dir):>10.2f}"
+                f"{statistics.median(timings) * 1000:>24.0f}{min(timings) * 1000:>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark many concurrent small requests over HTTP/1.1 vs cleartext HTTP/2 (h2c), against local servers
+started with each `SERVER_MODE` (see config/server.py).
+HTTP/1.1 clients need a connection per in-flight request, h2c multiplexes them over a single connection.
+
+Run: `python cli/main.py benchmark bench_http2 --requests 5000 --concurrency 100`
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from utils.metrics import percentile
+
+SERVICE_CONFIG_FILE = os.environ.get("SERVICE_CONFIG_FILE", "config/service_configs/local.env")
+
+
+def start_server(server_mode: str, port: int) -> subprocess.Popen:
+    """Start the service in a subprocess and wait for the health check to respond"""
+    env = {
+        **os.environ,
+        "SERVICE_CONFIG_FILE": SERVICE_CONFIG_FILE,
+        "SERVER_MODE": server_mode,
+        "SERVER_WORKERS": "1",
+        "PORT": str(port),
+        "LOG_LEVEL": "WARNING",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "config.server"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/healthcheck", timeout=1)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+
+    process.terminate()
+    raise RuntimeError(f"Server with SERVER_MODE={server_mode} did not start")
+
+
+async def run_load(port: int, http2: bool, requests: int, concurrency: int) -> dict:
+    """Send `requests` health check calls with up to `concurrency` in flight"""
+    limits = httpx.Limits(max_connections=1 if http2 else concurrency)
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(http1=not http2, http2=http2, limits=limits, timeout=30) as client:
+
+        async def call():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(f"http://127.0.0.1:{port}/healthcheck")
+                latencies.append(time.perf_counter() - start)
+                assert response.http_version == ("HTTP/2" if http2 else "HTTP/1.1")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(call() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "connections": 1 if http2 else concurrency,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000, help="Total number of requests per run")
+    parser.add_argument("--concurrency", type=int, default=100, help="Max requests in flight")
+    parser.add_argument("--port", type=int, default=8091, help="Local port to run servers on")
+    args = parser.parse_args()
+
+    runs = [("uvicorn", False), ("hypercorn-h2c", False), ("hypercorn-h2c", True)]
+
+    print(f"{'server_mode':<16}{'protocol':>10}{'connections':>13}{'req/s':>10}{'p50_ms':>10}{'p99_ms':>10}")
+    for server_mode, http2 in runs:
+        process = start_server(server_mode, args.port)
+        try:
+            result = asyncio.run(run_load(args.port, http2, args.requests, args.concurrency))
+        finally:
+            process.terminate()
+            process.wait()
+
+        print(
+            f"{server_mode:<16}{'h2c' if http2 else 'http/1.1':>10}{result['connections']:>13}"
+            f"{result['rps']:>10.0f}{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
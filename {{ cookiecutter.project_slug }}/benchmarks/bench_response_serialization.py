@@ -0,0 +1,100 @@
+"""Benchmark FastAPI's default response_model validation / serialization vs `FastResponseAPIRoute`, for list responses.
+
+Run: `python cli/main.py benchmark bench_response_serialization --sizes 10,1000,100000`
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, FastAPI
+from pydantic import BaseModel
+
+from api.routers.core import BaseAPIRoute, FastResponseAPIRoute
+from benchmarks.asgi import call_app
+
+
+class Address(BaseModel):
+    street: str
+    city: str
+    postal_code: Optional[str] = None
+
+
+class Customer(BaseModel):
+    id: int
+    name: str
+    email: str
+    created_at: datetime
+    tags: List[str]
+    address: Address
+
+
+CUSTOMERS: List[Customer] = []
+
+default_router = APIRouter(route_class=BaseAPIRoute)
+fast_router = APIRouter(route_class=FastResponseAPIRoute)
+
+
+@default_router.get("/default/customers", response_model=List[Customer])
+async def list_customers_default(count: int):
+    return CUSTOMERS[:count]
+
+
+@fast_router.get("/fast/customers", response_model=List[Customer])
+async def list_customers_fast(count: int):
+    return CUSTOMERS[:count]
+
+
+app = FastAPI()
+app.include_router(default_router)
+app.include_router(fast_router)
+
+
+def build_customers(count: int) -> List[Customer]:
+    return [
+        Customer(
+            id=i,
+            name=f"Customer {i}",
+            email=f"customer-{i}@example.com",
+            created_at=datetime(2023, 1, 1, 12, 0, 0),
+            tags=["retail", "priority"],
+            address=Address(street=f"{i} Main St", city="Springfield"),
+        )
+        for i in range(count)
+    ]
+
+
+def time_calls(path: str, count: int, repeat: int) -> float:
+    """Mean milliseconds per call"""
+
+    async def run() -> float:
+        status, _ = await call_app(app, "GET", path, query=f"count={count}")
+        assert status == 200
+        start = time.perf_counter()
+        for _ in range(repeat):
+            await call_app(app, "GET", path, query=f"count={count}")
+        return (time.perf_counter() - start) / repeat * 1000
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,1000,100000", help="Comma separated number of items per response")
+    parser.add_argument("--budget-items", type=int, default=1_000_000, help="Total items to serialize per measurement")
+    args = parser.parse_args()
+
+    sizes = [int(x) for x in args.sizes.split(",")]
+    CUSTOMERS.extend(build_customers(max(sizes)))
+
+    print(f"{'items':>10}{'default_ms':>14}{'fast_ms':>12}{'speedup':>10}")
+    for count in sizes:
+        repeat = max(args.budget_items // count, 3)
+        default_ms = time_calls("/default/customers", count, min(repeat, 2000))
+        fast_ms = time_calls("/fast/customers", count, min(repeat, 2000))
+        print(f"{count:>10}{default_ms:>14.3f}{fast_ms:>12.3f}{default_ms / fast_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
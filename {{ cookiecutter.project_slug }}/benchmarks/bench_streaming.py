@@ -0,0 +1,107 @@
+"""Benchmark peak memory of streaming vs buffered NDJSON ingestion and export, as payload size grows.
+The ASGI app is called in-process (no network), so results reflect only the service's own buffering.
+
+Run: `python cli/main.py benchmark bench_streaming --sizes-mb 1,10,100,1000`
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from fastapi import APIRouter, FastAPI, Request
+
+from api.routers.core import BaseAPIRoute, StreamingAPIRoute
+from api.streaming import NDJSONStreamingResponse, iter_ndjson
+from benchmarks.asgi import call_app
+
+RECORD_PAYLOAD = "x" * 1000
+RECORD = json.dumps({"id": 0, "payload": RECORD_PAYLOAD}).encode("utf-8") + b"\n"
+
+# Request body chunks are whole records, sized similarly to what ASGI servers deliver
+CHUNK = RECORD * (64 * 1024 // len(RECORD))
+
+streaming_router = APIRouter(route_class=StreamingAPIRoute)
+buffered_router = APIRouter(route_class=BaseAPIRoute)
+
+
+@streaming_router.post("/ingest/streaming")
+async def ingest_streaming(request: Request):
+    count = 0
+    async for _ in iter_ndjson(request):
+        count += 1
+    return {"records": count}
+
+
+@buffered_router.post("/ingest/buffered")
+async def ingest_buffered(request: Request):
+    body = await request.body()
+    records = [json.loads(line) for line in body.splitlines() if line]
+    return {"records": len(records)}
+
+
+async def generate_items(count: int):
+    for i in range(count):
+        yield {"id": i, "payload": RECORD_PAYLOAD}
+
+
+@streaming_router.get("/export/streaming")
+async def export_streaming(count: int):
+    return NDJSONStreamingResponse(generate_items(count))
+
+
+@buffered_router.get("/export/buffered")
+async def export_buffered(count: int):
+    return [item async for item in generate_items(count)]
+
+
+app = FastAPI()
+app.include_router(streaming_router)
+app.include_router(buffered_router)
+
+
+def measure(method: str, path: str, query: str = "", body_size: int = 0) -> tuple:
+    """Returns (peak traced memory in MB, seconds) for a single call"""
+    body_chunks = (CHUNK for _ in range(0, body_size, len(CHUNK)))
+    headers = [(b"content-type", b"application/x-ndjson")]
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    asyncio.run(call_app(app, method, path, query=query, body_chunks=body_chunks, headers=headers))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", default="1,10,100,1000", help="Comma separated payload sizes in MB")
+    parser.add_argument(
+        "--max-buffered-mb", type=int, default=100, help="Skip the buffered path above this size (it holds it all)"
+    )
+    args = parser.parse_args()
+
+    print(f"{'mode':<20}{'size_mb':>10}{'peak_mem_mb':>15}{'seconds':>10}")
+    for size_mb in [int(x) for x in args.sizes_mb.split(",")]:
+        body_size = size_mb * 1024 * 1024
+        item_count = body_size // len(RECORD)
+
+        runs = [
+            ("ingest_streaming", "POST", "/ingest/streaming", "", body_size),
+            ("export_streaming", "GET", "/export/streaming", f"count={item_count}", 0),
+        ]
+        if size_mb <= args.max_buffered_mb:
+            runs += [
+                ("ingest_buffered", "POST", "/ingest/buffered", "", body_size),
+                ("export_buffered", "GET", "/export/buffered", f"count={item_count}", 0),
+            ]
+
+        for name, method, path, query, size in runs:
+            peak_mb, elapsed = measure(method, path, query=query, body_size=size)
+            print(f"{name:<20}{size_mb:>10}{peak_mb:>15.1f}{elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 """Main CLI interface for the project"""
 
+import json
 import os
 import subprocess
 import sys
@@ -19,6 +20,11 @@ CLI_ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 # Fetch list of deployment scripts and service configs for CLI help
 DEPLOYMENT_SCRIPTS = os.listdir(os.path.join(os.path.dirname(CLI_ROOT_DIR), "config", "deployments"))
 SERVICE_CONFIGS = os.listdir(os.path.join(os.path.dirname(CLI_ROOT_DIR), "config", "service_configs"))
+BENCHMARKS = [
+    x.removesuffix(".py")
+    for x in os.listdir(os.path.join(os.path.dirname(CLI_ROOT_DIR), "benchmarks"))
+    if x.startswith("bench_") and x.endswith(".py")
+]
 
 
 @app.command()
@@ -109,6 +115,58 @@ def test(
     return
 
 
+@app.command(context_settings={"allow_extra_args": True, "ignore_unknown_options": True})
+def benchmark(
+    ctx: typer.Context,
+    benchmark_name: Annotated[str, typer.Argument(help=f"Options: {BENCHMARKS}")],
+):
+    """Run a benchmark script from the benchmarks directory. NOTE: extra command line flags are passed to the script."""
+    benchmark_module = benchmark_name.removesuffix(".py")
+
+    rprint(f"Running benchmark {benchmark_module} with flags={ctx.args}")
+
+    resp = subprocess.run(args=[sys.executable, "-m", f"benchmarks.{benchmark_module}"] + ctx.args, check=False)
+
+    if resp.returncode != 0:
+        rprint("[bold red]Benchmark failed.[/bold red]")
+        raise typer.Exit(code=2)
+
+    return
+
+
+@app.command()
+def build(
+    tag: Annotated[Optional[str], typer.Option(help="Image tag, defaults to the project directory name")] = None,
+    cold_start_runs: Annotated[int, typer.Option(help="If > 0, also run the cold start benchmark this many times")] = 0,
+):
+    """Build the service container image via the Dockerfile and report its size.
+    Optionally compare local cold start times of the source vs container layouts (see benchmarks/bench_cold_start.py).
+    """
+    project_root = os.path.dirname(CLI_ROOT_DIR)
+    tag = tag or f"{os.path.basename(project_root).lower()}:local"
+
+    rprint(f"[blue]Building image {tag}[/blue]")
+    build_resp = subprocess.run(args=["docker", "build", "-t", tag, project_root], check=False)
+
+    if build_resp.returncode != 0:
+        rprint("[bold red]Failed to build image![/bold red]")
+        raise typer.Abort()
+
+    inspect_resp = subprocess.run(args=["docker", "image", "inspect", tag], check=False, capture_output=True)
+    if inspect_resp.returncode == 0:
+        image_size_mb = json.loads(inspect_resp.stdout)[0]["Size"] / 1024 / 1024
+        rprint(f"[green]Built image {tag}; size={image_size_mb:.1f}MB[/green]")
+
+    if cold_start_runs > 0:
+        subprocess.run(
+            args=[sys.executable, "-m", "benchmarks.bench_cold_start", f"--runs={cold_start_runs}"],
+            cwd=project_root,
+            check=False,
+        )
+
+    return
+
+
 @app.command()
 def deploy(
     deploy_script: Annotated[str, typer.Argument(help=f"Options: {DEPLOYMENT_SCRIPTS}")],
@@ -47,6 +47,12 @@ if [ $((gcr_allow_unauthenticated)) -eq 1 ]; then
   AUTH_SETTINGS_FLAG="--allow-unauthenticated"
 fi
 
+# End-to-end HTTP/2 requires the service to serve h2c, only enabled for server modes that support it
+HTTP2_FLAG="--no-use-http2"
+if [ "${SERVER_MODE:-uvicorn}" = "hypercorn-h2c" ]; then
+  HTTP2_FLAG="--use-http2"
+fi
+
 # Deploy Service!
 echo "Deploying ${SERVICE_NAME} to Cloud Run: ${DEFAULT_GCP_PROJECT}.${DEFAULT_GCP_REGION}; env=${SERVICE_ENV}; version=${VERSION}; traffic_percent=${TRAFFIC_PERCENT}"
 
@@ -63,6 +69,7 @@ gcloud run deploy ${SERVICE_NAME} \
   --timeout=${gcr_timeout} \
   --max-instances=${gcr_max_instances} \
   ${AUTH_SETTINGS_FLAG} \
+  ${HTTP2_FLAG} \
   --set-env-vars=SERVICE_CONFIG_FILE=${SERVICE_CONFIG} \
   --update-labels=service-name=${SERVICE_NAME},service-env=${SERVICE_ENV} \
   --tag=${VERSION} \
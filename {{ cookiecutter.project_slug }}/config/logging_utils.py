@@ -1,18 +1,40 @@
 """Helpers for setting up logging in local and deployed envs"""
+{%- if cookiecutter.log_pipeline == "async-queue" %}
+import atexit
+{%- endif %}
 import importlib
+{%- if cookiecutter.json_backend == "stdlib" %}
 import json
+{%- endif %}
 import logging
+{%- if cookiecutter.log_pipeline == "async-queue" %}
+import logging.handlers
+{%- endif %}
 import os
+{%- if cookiecutter.log_pipeline == "async-queue" %}
+import queue
+{%- endif %}
 import sys
+import time
 from contextvars import ContextVar
 from typing import Optional
 
-from fastapi import Request
+{% if cookiecutter.json_backend == "orjson" %}import orjson
+{% endif %}from fastapi import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 # FastAPI does not have a global context with the Request object like Flask,
 # using ContextVar to create one
 request_context_var: ContextVar[Optional[Request]] = ContextVar("request_context_var", default=None)
 
+# Logger for per-request access logs, ex. set its level to WARNING to turn them off
+access_logger = logging.getLogger("access")
+{%- if cookiecutter.log_pipeline == "async-queue" %}
+
+# Background thread writing queued log records, see init_logging
+_log_listener: Optional[logging.handlers.QueueListener] = None
+{%- endif %}
+
 
 async def set_request_context(request: Request):
     """Set global request context var"""
@@ -20,6 +42,15 @@ async def set_request_context(request: Request):
     return
 
 
+def dumps_log(log_fields: dict) -> str:
+    """Serialize a structured log payload, values that aren't JSON serializable are logged as strings"""
+{%- if cookiecutter.json_backend == "orjson" %}
+    return orjson.dumps(log_fields, default=str).decode("utf-8")
+{%- else %}
+    return json.dumps(log_fields, default=str)
+{%- endif %}
+
+
 class GCPLogFormatter(logging.Formatter):
     """GCP log formatter, for use in deployed GCP envs.
     Writes json logs matching GCP's Structured Logging payload format.
@@ -36,11 +67,21 @@ class GCPLogFormatter(logging.Formatter):
             },
         }
 
+        # Structured fields can be passed via `logging.info("msg", extra={"json_fields": {...}})`
+        json_fields = getattr(record, "json_fields", None)
+        if isinstance(json_fields, dict):
+            log_fields.update(json_fields)
+
         # If a fastapi Request object is defined in the above ContextVar,
         # fetch and add extra info, else write json log
+{%- if cookiecutter.log_pipeline == "async-queue" %}
+        # Records written from the queue listener thread carry the request context of the logging call
+        http_request_context: Request = getattr(record, "request_context", None) or request_context_var.get()
+{%- else %}
         http_request_context: Request = request_context_var.get()
+{%- endif %}
         if not http_request_context:
-            return json.dumps(log_fields)
+            return dumps_log(log_fields)
 
         trace_header = http_request_context.headers.get("X-Cloud-Trace-Context")
         cloud_tasks_header = http_request_context.headers.get(
@@ -53,7 +94,7 @@ class GCPLogFormatter(logging.Formatter):
             if "/" in trace_header:
                 trace, span_id = trace_header.split("/")
                 log_fields["logging.googleapis.com/trace"] = (
-                    "projects/{gcp_project}/traces/{trace}" if gcp_project else trace
+                    f"projects/{gcp_project}/traces/{trace}" if gcp_project else trace
                 )
                 log_fields["logging.googleapis.com/spanId"] = span_id
             else:
@@ -63,11 +104,91 @@ class GCPLogFormatter(logging.Formatter):
         if cloud_tasks_header:
             log_fields["cloud_task_id"] = cloud_tasks_header
 
-        return json.dumps(log_fields)
+        return dumps_log(log_fields)
+
+
+class AccessLogMiddleware:
+    """ASGI middleware writing a single access log per request once its response completes, replacing the server's.
+    Fields use Cloud Logging's `httpRequest` format, so latency, status and sizes show in the Logs Explorer.
+    docs: https://cloud.google.com/logging/docs/reference/v2/rest/v2/LogEntry#HttpRequest
+    Also sets the request context, so the access log and any logs before routing include trace fields.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        request_context_var.set(request)
+        start = time.perf_counter()
+        end = None
+        status_code = 500
+        request_size = 0
+        response_size = 0
+
+        async def receive_counting() -> Message:
+            nonlocal request_size
+            message = await receive()
+            request_size += len(message.get("body", b""))
+            return message
+
+        async def send_counting(message: Message) -> None:
+            nonlocal end, status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    end = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive_counting, send_counting)
+        finally:
+            latency = (end or time.perf_counter()) - start
+            # Cloud Run's front end appends the client IP as the last X-Forwarded-For address,
+            # earlier addresses are sent by the client and can be spoofed
+            forwarded_for = request.headers.get("X-Forwarded-For")
+            remote_ip = forwarded_for.split(",")[-1].strip() if forwarded_for else (scope.get("client") or ("",))[0]
+            http_request = {
+                "requestMethod": scope["method"],
+                "requestUrl": str(request.url),
+                "requestSize": str(request_size),
+                "status": status_code,
+                "responseSize": str(response_size),
+                "userAgent": request.headers.get("User-Agent", ""),
+                "remoteIp": remote_ip,
+                "referer": request.headers.get("Referer", ""),
+                "latency": f"{latency:.6f}s",
+                "protocol": f"HTTP/{scope.get('http_version', '1.1')}",
+            }
+            access_logger.info(
+                f"{scope['method']} {scope['path']} {status_code} {latency * 1000:.1f}ms",
+                extra={"json_fields": {"httpRequest": http_request}},
+            )
+        return
+{%- if cookiecutter.log_pipeline == "async-queue" %}
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that keeps the current request context on the record, for formatting in the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record.request_context = request_context_var.get()
+        return record
+{%- endif %}
 
 
 def init_logging(level: str, gcp_logging: bool) -> None:
     """Helper fucntion to initialize loggers, for both local and deployed envs"""
+{%- if cookiecutter.log_pipeline == "async-queue" %}
+    global _log_listener  # pylint: disable=global-statement
+{%- endif %}
 
     # Logging defaults
     log_format = "%(levelname)s:%(name)s:%(message)s"
@@ -87,6 +208,22 @@ def init_logging(level: str, gcp_logging: bool) -> None:
 
         handlers = [RichHandler(rich_tracebacks=True)]
         log_format = "%(module)s:%(message)s"
+{%- if cookiecutter.log_pipeline == "async-queue" %}
+
+    # Write logs from a background thread, so logging calls on the event loop only enqueue the record
+    for handler in handlers:
+        if handler.formatter is None:
+            handler.setFormatter(logging.Formatter(log_format))
+    log_queue = queue.SimpleQueue()
+    _log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(flush_logging)
+
+    # Only the message is formatted when enqueuing, the listener's handlers apply the log format
+    queue_handler = ContextQueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    handlers = [queue_handler]
+{%- endif %}
 
     # Setup logging
     logging.basicConfig(
@@ -95,3 +232,23 @@ def init_logging(level: str, gcp_logging: bool) -> None:
         handlers=handlers,
     )
     return
+
+
+def flush_logging() -> None:
+    """Write out buffered log records, call last on shutdown"""
+{%- if cookiecutter.log_pipeline == "async-queue" %}
+    global _log_listener  # pylint: disable=global-statement
+
+    # Stopping the listener writes all queued records before returning, later records are written directly
+    if _log_listener is not None:
+        _log_listener.stop()
+        root_logger = logging.getLogger()
+        for handler in list(root_logger.handlers):
+            root_logger.removeHandler(handler)
+        for handler in _log_listener.handlers:
+            root_logger.addHandler(handler)
+        _log_listener = None
+{%- endif %}
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+    return
@@ -0,0 +1,61 @@
+"""Service launcher, starts the configured ASGI server (see `SERVER_MODE` in service_config.py).
+Used when deployed (see Procfile) and by main.py when running locally.
+- `uvicorn`: HTTP/1.1 only.
+- `hypercorn-h2c`: also serves cleartext HTTP/2 (h2c), needed for Cloud Run's end-to-end HTTP/2 (`--use-http2`)
+  so clients making many small concurrent calls can multiplex them over a single connection.
+"""
+import asyncio
+import os
+
+from config.service_config import SERVICE_CONFIG, ServerMode
+
+APP_PATH = "main:app"
+
+
+def serve(
+    host: str = "0.0.0.0",
+    port: int = 8080,
+    server_mode: ServerMode = SERVICE_CONFIG.SERVER_MODE,
+    workers: int = SERVICE_CONFIG.SERVER_WORKERS,
+    reload: bool = False,
+) -> None:
+    """Run the service with the given ASGI server, blocks until the server shuts down"""
+    if server_mode == ServerMode.HYPERCORN_H2C:
+        # pylint: disable-next=import-outside-toplevel
+        from hypercorn.config import Config
+        from hypercorn.run import run
+
+        config = Config()
+        config.application_path = APP_PATH
+        config.bind = [f"{host}:{port}"]
+        config.workers = workers
+        config.use_reloader = reload
+        config.graceful_timeout = SERVICE_CONFIG.SHUTDOWN_GRACE_PERIOD_S
+        # Requests are logged by AccessLogMiddleware (see config/logging_utils.py)
+        config.accesslog = None
+
+        if workers > 1 or reload:
+            # Worker processes are stopped by the parent process, waiting up to `graceful_timeout` for requests
+            run(config)
+            return
+
+        # Serve in this process, so SIGTERM reaches the shutdown coordinator which drains requests (see api/shutdown.py)
+        # pylint: disable-next=import-outside-toplevel
+        from hypercorn.asyncio import serve as hypercorn_serve
+
+        from api.shutdown import shutdown_coordinator
+        from main import app
+
+        shutdown_coordinator.handover_signal = None
+        asyncio.run(hypercorn_serve(app, config, shutdown_trigger=shutdown_coordinator.wait_drained))
+        return
+
+    # pylint: disable-next=import-outside-toplevel
+    import uvicorn
+
+    uvicorn.run(APP_PATH, host=host, port=port, workers=None if reload else workers, reload=reload, access_log=False)
+    return
+
+
+if __name__ == "__main__":
+    serve(port=int(os.getenv("PORT", "8080")))
@@ -2,6 +2,7 @@
 
 import os
 from enum import Enum
+from typing import List, Optional
 
 from pydantic import Field, constr
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -19,6 +20,21 @@ class LogLevel(str, Enum):
     DEBUG = "DEBUG"
 
 
+class ServerMode(str, Enum):
+    """ASGI server options, see config/server.py"""
+
+    UVICORN = "uvicorn"
+    HYPERCORN_H2C = "hypercorn-h2c"
+
+
+class DataCacheL2Backend(str, Enum):
+    """Shared (L2) data cache backend options, see utils/data_cache.py"""
+
+    NONE = "none"
+    MEMORY = "memory"
+    FILE = "file"
+
+
 class ServiceConfigModel(BaseSettings):
     """Main Service Configuration Definition, ie service-wide constants and configurations - values to be specied via .env file and loaded in at runtime"""
 
@@ -30,8 +46,118 @@ class ServiceConfigModel(BaseSettings):
     SERVICE_NAME: str = Field(description="Service Name.")
     SERVICE_ENV: constr(to_lower=True) = Field(description="Service environment (ex. `prod`, `dev`, `test`, etc.).")
     HEALTH_CHECK_ROUTE: str = Field(description="API Route to use as health check.", default="/healthcheck")
+    READINESS_ROUTE: str = Field(description="API Route returning 503 once shutting down.", default="/readiness")
     LOG_LEVEL: LogLevel = Field(default=LogLevel.INFO)
 
+    # Server
+    SERVER_MODE: ServerMode = Field(
+        description="ASGI server to run, `hypercorn-h2c` also serves HTTP/2 and enables end-to-end HTTP/2 on deploy.",
+        default=ServerMode.UVICORN,
+    )
+    SERVER_WORKERS: int = Field(description="Number of server worker processes.", default=1, ge=1)
+    OPENAPI_SCHEMA_FILE: Optional[str] = Field(
+        description="Pre-generated OpenAPI document to serve instead of generating it at runtime (see Dockerfile).",
+        default=None,
+    )
+
+    # Request deadlines
+    REQUEST_TIMEOUT_S: float = Field(
+        description="Seconds requests may run before they're cancelled, unless they send `X-Request-Timeout-Ms`.",
+        default=60,
+        gt=0,
+    )
+    REQUEST_MAX_TIMEOUT_S: float = Field(
+        description="Max seconds requests can ask for via `X-Request-Timeout-Ms`, keep below `gcr_timeout`.",
+        default=300,
+        gt=0,
+    )
+
+    # Shutdown
+    SHUTDOWN_GRACE_PERIOD_S: float = Field(
+        description="Max seconds in-flight requests get to finish after SIGTERM (Cloud Run sends SIGKILL after 10).",
+        default=8,
+        ge=0,
+    )
+
+    # Event loop monitoring
+    LOOP_MONITOR_ENABLED: bool = Field(description="Monitor event loop lag and log blocking calls.", default=True)
+    LOOP_MONITOR_INTERVAL_S: float = Field(
+        description="Seconds between event loop lag measurements.", default=0.25, gt=0
+    )
+    LOOP_MONITOR_LAG_THRESHOLD_S: float = Field(
+        description="Seconds of event loop lag after which the blocking stack is captured and logged.",
+        default=0.1,
+        gt=0,
+    )
+    LOOP_MONITOR_SUMMARY_INTERVAL_S: float = Field(
+        description="Seconds between event loop lag percentile summary logs, 0 to disable.", default=300, ge=0
+    )
+
+    # Data cache
+    DATA_CACHE_MAX_MB: int = Field(description="Max memory used by the in-process (L1) data cache.", default=64, ge=1)
+    DATA_CACHE_TTL_S: float = Field(description="Default seconds cached data is fresh for.", default=300, ge=0)
+    DATA_CACHE_STALE_TTL_S: float = Field(
+        description="Seconds expired data is still served while it's refreshed in the background.", default=60, ge=0
+    )
+    DATA_CACHE_NEGATIVE_TTL_S: float = Field(description="Seconds `None` (not found) results are cached.", default=30)
+    DATA_CACHE_L2_BACKEND: DataCacheL2Backend = Field(
+        description="Shared data cache backend, `memory` and `file` are local stand-ins for a shared store.",
+        default=DataCacheL2Backend.NONE,
+    )
+    DATA_CACHE_L2_DIR: str = Field(description="Directory for the `file` L2 backend.", default="/tmp/data_cache")
+
+    # Outbound HTTP client
+    HTTP_CLIENT_TIMEOUT_S: float = Field(description="Default seconds per outbound request attempt.", default=10, gt=0)
+    HTTP_CLIENT_MAX_RETRIES: int = Field(description="Max retries of failed idempotent requests.", default=2, ge=0)
+    HTTP_CLIENT_RETRY_BUDGET_RATIO: float = Field(
+        description="Ratio of outbound requests that may be retried or hedged.", default=0.1, ge=0
+    )
+    HTTP_CLIENT_HEDGE_PERCENTILE: float = Field(
+        description="Latency percentile after which safe requests are hedged, 0 to disable.", default=95, ge=0, lt=100
+    )
+    HTTP_CLIENT_BREAKER_FAILURE_THRESHOLD: int = Field(
+        description="Consecutive failures after which a host's circuit breaker opens.", default=5, ge=1
+    )
+    HTTP_CLIENT_BREAKER_RESET_S: float = Field(
+        description="Seconds a circuit breaker stays open before a trial request.", default=30, gt=0
+    )
+
+    # Inbound ID token verification
+    AUTH_AUDIENCE: Optional[str] = Field(
+        description="Expected `aud` of inbound ID tokens (ex. the service URL), enables `verify_id_token` if set.",
+        default=None,
+    )
+    AUTH_ISSUERS: List[str] = Field(
+        description="Accepted `iss` of inbound ID tokens.",
+        default=["https://accounts.google.com", "accounts.google.com"],
+    )
+    AUTH_JWKS_URL: str = Field(
+        description="JWKS URL of the token issuer's signing keys.", default="https://www.googleapis.com/oauth2/v3/certs"
+    )
+    AUTH_TOKEN_CACHE_SIZE: int = Field(
+        description="Max verified tokens cached until they expire, 0 to verify every request.", default=10000, ge=0
+    )
+
+{%- if cookiecutter.database == "postgresql" %}
+
+    # Database
+    DB_URL: str = Field(description="SQLAlchemy async database URL, ex. `postgresql+asyncpg://user:password@/db`.")
+    DB_POOL_MAX_SIZE: int = Field(description="Max pooled connections per worker process.", default=20, ge=1)
+    DB_POOL_MAX_OVERFLOW: int = Field(description="Extra connections opened under load beyond the pool.", default=0)
+    DB_POOL_TIMEOUT_S: float = Field(description="Seconds to wait for a free pooled connection.", default=10, gt=0)
+    DB_STATEMENT_CACHE_SIZE: int = Field(description="Compiled / prepared statement cache size.", default=500, ge=0)
+    DB_SLOW_QUERY_THRESHOLD_S: float = Field(description="Seconds after which queries are logged.", default=0.5)
+    GCR_CONCURRENCY: int = Field(
+        description="Max concurrent requests per instance (`gcr_concurrency`), sizes the DB pool.", default=1, ge=1
+    )
+{%- endif %}
+{%- if cookiecutter.batch_endpoint == "enabled" %}
+
+    # Batch endpoint
+    BATCH_MAX_REQUESTS: int = Field(description="Max sub-requests per `/batch` request.", default=20, ge=1)
+    BATCH_MAX_CONCURRENCY: int = Field(description="Max sub-requests of a batch run at a time.", default=8, ge=1)
+{%- endif %}
+
     # Deployment defaults
     DEFAULT_GCP_PROJECT: str = Field(description="Default GCP Project, used when deploying, etc.")
     DEFAULT_GCP_REGION: str = Field(description="Default GCP Region, used when deploying, etc.")
@@ -0,0 +1,180 @@
+"""Pooled async database access, the engine (and its connection pool) is created once in the app lifespan.
+Use `get_db_session` as a FastAPI dependency, ex. `async def handler(session: AsyncSession = Depends(get_db_session))`
+Sessions wait for a pooled connection no longer than the request's remaining budget (see api/deadline.py), and
+queries in progress when a request is cancelled are cancelled on the server by asyncpg.
+"""
+import asyncio
+import logging
+import math
+import time
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from api.deadline import DEADLINE_EXCEEDED_DETAIL, remaining_budget
+from utils.metrics import SampleWindow, register_stats, unregister_stats
+
+# Max characters of a statement included in slow query logs
+MAX_LOGGED_STATEMENT_CHARS = 1000
+
+_engine: Optional[AsyncEngine] = None
+_session_factory: Optional[async_sessionmaker] = None
+_pool_timeout: float = 10
+_pool_wait = SampleWindow()
+_query_duration = SampleWindow()
+_slow_queries = 0
+
+
+def pool_size_for(concurrency: int, workers: int, max_size: int) -> int:
+    """Connections per worker process so every concurrent request can hold one, capped at `max_size`.
+    Cloud Run sends up to `concurrency` requests per instance, spread across the instance's worker processes.
+    """
+    return max(min(math.ceil(concurrency / workers), max_size), 1)
+
+
+def init_db(
+    url: str,
+    pool_size: int,
+    max_overflow: int = 0,
+    pool_timeout: float = 10,
+    statement_cache_size: int = 500,
+    slow_query_threshold: float = 0.5,
+) -> AsyncEngine:
+    """Create the service-wide engine and session factory, called from the app lifespan.
+
+    Args:
+        url (str): SQLAlchemy async database URL, ex. `postgresql+asyncpg://user:password@/db?host=/cloudsql/...`
+        pool_size (int): Connections kept open per worker process, see `pool_size_for`.
+        max_overflow (int): Extra connections opened under load beyond `pool_size`.
+        pool_timeout (float): Seconds to wait for a free connection before raising.
+        statement_cache_size (int): Compiled SQL cache size, also the asyncpg prepared statement cache size.
+        slow_query_threshold (float): Seconds after which a query is logged as slow.
+
+    Returns:
+        AsyncEngine: The created engine.
+    """
+    global _engine, _session_factory, _pool_timeout  # pylint: disable=global-statement
+
+    db_url = make_url(url)
+    if db_url.drivername == "postgresql+asyncpg":
+        # Prepared statements are cached per connection, so repeated queries skip parsing / planning on the server
+        db_url = db_url.update_query_dict({"prepared_statement_cache_size": str(statement_cache_size)})
+
+    pool_kwargs = {}
+    if not db_url.drivername.startswith("sqlite") or db_url.database not in (None, "", ":memory:"):
+        # Explicit, as some dialects default to a pool without these options, ex. NullPool for aiosqlite files
+        pool_kwargs = {
+            "poolclass": AsyncAdaptedQueuePool,
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_timeout": pool_timeout,
+        }
+
+    _engine = create_async_engine(db_url, query_cache_size=statement_cache_size, pool_pre_ping=True, **pool_kwargs)
+    _session_factory = async_sessionmaker(_engine, expire_on_commit=False)
+    _pool_timeout = pool_timeout
+
+    _log_slow_queries(_engine, slow_query_threshold)
+    register_stats("db", db_stats)
+    logging.info(f"Created database engine; driver={db_url.drivername}; pool_size={pool_size}")
+    return _engine
+
+
+async def close_db() -> None:
+    """Close all pooled connections, call on shutdown"""
+    global _engine, _session_factory  # pylint: disable=global-statement
+
+    if _engine is not None:
+        await _engine.dispose()
+    _engine, _session_factory = None, None
+    unregister_stats("db")
+    return
+
+
+async def get_db_session() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency yielding a session holding a pooled connection for the request.
+    Commit explicitly, uncommitted changes are rolled back when the request finishes.
+
+    Raises:
+        HTTPException: 504 if the request's deadline passes while waiting for a pooled connection.
+    """
+    if _session_factory is None:
+        raise RuntimeError("Database not initialized, see init_db()")
+
+    async with _session_factory() as session:
+        start = time.perf_counter()
+        remaining = remaining_budget()
+        if remaining is not None and remaining < _pool_timeout:
+            try:
+                await asyncio.wait_for(session.connection(), remaining)
+            except asyncio.TimeoutError as exc:
+                raise HTTPException(
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=DEADLINE_EXCEEDED_DETAIL
+                ) from exc
+        else:
+            await session.connection()
+        _pool_wait.add(time.perf_counter() - start)
+        yield session
+
+
+def db_stats() -> dict:
+    """Pool usage, connection wait and query duration percentiles (in milliseconds), and slow query count"""
+
+    def to_ms(window: SampleWindow) -> dict:
+        return {k: round(v * 1000, 3) if v is not None else None for k, v in window.percentiles().items()}
+
+    pool = _engine.pool if _engine is not None else None
+    return {
+        "pool_size": pool.size() if hasattr(pool, "size") else None,
+        "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+        "pool_wait_ms": to_ms(_pool_wait),
+        "query_ms": to_ms(_query_duration),
+        "queries": _query_duration.count,
+        "slow_queries": _slow_queries,
+    }
+
+
+def _log_slow_queries(engine: AsyncEngine, threshold: float) -> None:
+    """Time every statement, logging those slower than `threshold` seconds with structured fields"""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(context):
+        # Failed statements don't reach after_cursor_execute, drop their start time
+        query_start = context.connection.info.get("query_start") if context.connection is not None else None
+        if query_start:
+            query_start.pop()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        global _slow_queries  # pylint: disable=global-statement
+
+        duration = time.perf_counter() - conn.info["query_start"].pop()
+        _query_duration.add(duration)
+        if duration < threshold:
+            return
+
+        _slow_queries += 1
+        logging.warning(
+            f"Slow query; duration={duration * 1000:.1f}ms",
+            extra={
+                "json_fields": {
+                    "db_statement": statement[:MAX_LOGGED_STATEMENT_CHARS],
+                    "db_duration_ms": round(duration * 1000, 3),
+                }
+            },
+        )
+
+    return
@@ -1,34 +1,145 @@
 """ Main module and entrypoint for the service."""
+import json
+import logging
 import os
+from contextlib import asynccontextmanager
 
-import uvicorn
 from fastapi import Depends, FastAPI
+{%- if cookiecutter.json_backend == "orjson" %}
+from fastapi.responses import ORJSONResponse
+{%- endif %}
 
-from api.routers import health_check
-from config import logging_utils
+from api import auth
+from api.deadline import DeadlineMiddleware
+from api.routers import {% if cookiecutter.batch_endpoint == "enabled" %}batch, {% endif %}health_check{% if cookiecutter.metrics == "stats-endpoint" %}, metrics{% endif %}
+from api.shutdown import InFlightMiddleware, shutdown_coordinator
+from config import logging_utils, server
 from config.gcp_env import GCP_ENV_DATA
 from config.service_config import SERVICE_CONFIG
-
+{%- if cookiecutter.database == "postgresql" %}
+from db import engine as db_engine
+{%- endif %}
+from utils import data_cache, http_client
+from utils.loop_monitor import EventLoopMonitor
 
 logging_utils.init_logging(level=SERVICE_CONFIG.LOG_LEVEL, gcp_logging=GCP_ENV_DATA.IS_DEPLOYED)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start up and shut down service-wide resources"""
+    loop_monitor = None
+    if SERVICE_CONFIG.LOOP_MONITOR_ENABLED:
+        loop_monitor = EventLoopMonitor(
+            interval=SERVICE_CONFIG.LOOP_MONITOR_INTERVAL_S,
+            lag_threshold=SERVICE_CONFIG.LOOP_MONITOR_LAG_THRESHOLD_S,
+            summary_interval=SERVICE_CONFIG.LOOP_MONITOR_SUMMARY_INTERVAL_S,
+        )
+        loop_monitor.start()
+
+    cache = data_cache.init_data_cache(
+        l2_backend=SERVICE_CONFIG.DATA_CACHE_L2_BACKEND,
+        l2_dir=SERVICE_CONFIG.DATA_CACHE_L2_DIR,
+        max_bytes=SERVICE_CONFIG.DATA_CACHE_MAX_MB * 1024 * 1024,
+        ttl=SERVICE_CONFIG.DATA_CACHE_TTL_S,
+        stale_ttl=SERVICE_CONFIG.DATA_CACHE_STALE_TTL_S,
+        negative_ttl=SERVICE_CONFIG.DATA_CACHE_NEGATIVE_TTL_S,
+    )
+
+    client = http_client.init_http_client(
+        timeout=SERVICE_CONFIG.HTTP_CLIENT_TIMEOUT_S,
+        max_retries=SERVICE_CONFIG.HTTP_CLIENT_MAX_RETRIES,
+        retry_budget_ratio=SERVICE_CONFIG.HTTP_CLIENT_RETRY_BUDGET_RATIO,
+        hedge_percentile=SERVICE_CONFIG.HTTP_CLIENT_HEDGE_PERCENTILE,
+        breaker_failure_threshold=SERVICE_CONFIG.HTTP_CLIENT_BREAKER_FAILURE_THRESHOLD,
+        breaker_reset_timeout=SERVICE_CONFIG.HTTP_CLIENT_BREAKER_RESET_S,
+    )
+
+    token_verifier = None
+    if SERVICE_CONFIG.AUTH_AUDIENCE:
+        token_verifier = auth.init_token_verifier(
+            audience=SERVICE_CONFIG.AUTH_AUDIENCE,
+            issuers=SERVICE_CONFIG.AUTH_ISSUERS,
+            jwks_url=SERVICE_CONFIG.AUTH_JWKS_URL,
+            client=client,
+            max_tokens=SERVICE_CONFIG.AUTH_TOKEN_CACHE_SIZE,
+        )
+{%- if cookiecutter.database == "postgresql" %}
+
+    db_engine.init_db(
+        url=SERVICE_CONFIG.DB_URL,
+        pool_size=db_engine.pool_size_for(
+            SERVICE_CONFIG.GCR_CONCURRENCY, SERVICE_CONFIG.SERVER_WORKERS, SERVICE_CONFIG.DB_POOL_MAX_SIZE
+        ),
+        max_overflow=SERVICE_CONFIG.DB_POOL_MAX_OVERFLOW,
+        pool_timeout=SERVICE_CONFIG.DB_POOL_TIMEOUT_S,
+        statement_cache_size=SERVICE_CONFIG.DB_STATEMENT_CACHE_SIZE,
+        slow_query_threshold=SERVICE_CONFIG.DB_SLOW_QUERY_THRESHOLD_S,
+    )
+{%- endif %}
+
+    shutdown_coordinator.install(grace_period=SERVICE_CONFIG.SHUTDOWN_GRACE_PERIOD_S)
+
+    yield
+
+    # Runs once in-flight requests drained (see api/shutdown.py). Close users of a resource before the resource
+    # (ex. cache loads querying the DB before the DB pool), and flush logs last so shutdown logs are written.
+    await cache.close()
+    if token_verifier:
+        await token_verifier.close()
+    await client.aclose()
+{%- if cookiecutter.database == "postgresql" %}
+    await db_engine.close_db()
+{%- endif %}
+    if loop_monitor:
+        await loop_monitor.stop()
+    logging.info("Shutdown complete")
+    logging_utils.flush_logging()
+
+
 app = FastAPI(
     debug=True,
     title="{{ cookiecutter.project_slug }}",
     description="{{ cookiecutter.project_description }}",
     version="0.1.0",
     dependencies=[Depends(logging_utils.set_request_context)],
+    lifespan=lifespan,
+{%- if cookiecutter.json_backend == "orjson" %}
+    default_response_class=ORJSONResponse,
+{%- endif %}
+)
+app.add_middleware(
+    DeadlineMiddleware,
+    default_timeout=SERVICE_CONFIG.REQUEST_TIMEOUT_S,
+    max_timeout=SERVICE_CONFIG.REQUEST_MAX_TIMEOUT_S,
 )
+{%- if cookiecutter.metrics == "stats-endpoint" %}
+app.add_middleware(metrics.RequestMetricsMiddleware)
+{%- endif %}
+# Outermost middleware (added last), logging responses of all other middleware (ex. deadline 504s),
+# and counting requests in flight until their access log is written
+app.add_middleware(logging_utils.AccessLogMiddleware)
+app.add_middleware(InFlightMiddleware, coordinator=shutdown_coordinator)
 
 
 app.include_router(health_check.router)
+{%- if cookiecutter.metrics == "stats-endpoint" %}
+app.include_router(metrics.router)
+{%- endif %}
+{%- if cookiecutter.batch_endpoint == "enabled" %}
+app.include_router(batch.router)
+{%- endif %}
+
+# Serve the OpenAPI document pre-generated at build time if available, rather than generating it on first request
+if SERVICE_CONFIG.OPENAPI_SCHEMA_FILE and os.path.isfile(SERVICE_CONFIG.OPENAPI_SCHEMA_FILE):
+    with open(SERVICE_CONFIG.OPENAPI_SCHEMA_FILE, encoding="utf-8") as openapi_file:
+        app.openapi_schema = json.load(openapi_file)
 
 
 if __name__ == "__main__":
     # This is used when running locally.
-    # Uvicorn is used to run the application when deployed. See entrypoint in Dockerfile or Procfile.
+    # config/server.py is used to run the application when deployed. See entrypoint in Dockerfile or Procfile.
 
     PORT = int(os.getenv("PORT")) if os.getenv("PORT") else 8080
 
-    uvicorn.run("main:app", host="0.0.0.0", port=PORT, reload=True)
+    server.serve(port=PORT, reload=True)
@@ -0,0 +1,64 @@
+"""Unit test structured access logs"""
+import io
+import json
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from config.logging_utils import AccessLogMiddleware, GCPLogFormatter
+
+app = FastAPI()
+app.add_middleware(AccessLogMiddleware)
+
+
+@app.post("/echo")
+async def echo(payload: dict):
+    logging.info("Handling echo")
+    return payload
+
+
+def test_single_access_log_per_request(caplog, monkeypatch):
+    monkeypatch.setenv("GCP_PROJECT", "test-project")
+    # Format as deployed, while the request context is set
+    stream = io.StringIO()
+    gcp_handler = logging.StreamHandler(stream)
+    gcp_handler.setFormatter(GCPLogFormatter())
+    logging.getLogger("access").addHandler(gcp_handler)
+    headers = {
+        "User-Agent": "test-agent",
+        # Client-sent address first, then the one appended by the front end
+        "X-Forwarded-For": "198.51.100.1, 203.0.113.7",
+        "X-Cloud-Trace-Context": "abc123/456",
+    }
+
+    try:
+        with caplog.at_level(logging.INFO):
+            response = TestClient(app).post("/echo", json={"message": "hello"}, headers=headers)
+    finally:
+        logging.getLogger("access").removeHandler(gcp_handler)
+
+    access_logs = [record for record in caplog.records if record.name == "access"]
+    assert response.status_code == 200
+    assert len(access_logs) == 1
+
+    http_request = access_logs[0].json_fields["httpRequest"]
+    assert http_request["requestMethod"] == "POST"
+    assert http_request["status"] == 200
+    assert http_request["requestSize"] == str(len(b'{"message": "hello"}'))
+    assert http_request["responseSize"] == str(len(response.content))
+    assert http_request["userAgent"] == "test-agent"
+    assert http_request["remoteIp"] == "203.0.113.7"
+    assert http_request["latency"].endswith("s") and float(http_request["latency"][:-1]) > 0
+
+    log = json.loads(stream.getvalue())
+    assert log["httpRequest"] == http_request
+    assert log["logging.googleapis.com/trace"] == "projects/test-project/traces/abc123"
+
+
+def test_remote_ip_falls_back_to_client(caplog):
+    with caplog.at_level(logging.INFO):
+        TestClient(app).post("/echo", json={})
+
+    access_log = next(record for record in caplog.records if record.name == "access")
+    assert access_log.json_fields["httpRequest"]["remoteIp"] == "testclient"
@@ -0,0 +1,228 @@
+"""Unit test ID token verification, offline against locally generated signing keys"""
+import asyncio
+import json
+import time
+
+import httpx
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from api import auth
+from api.deadline import REQUEST_TIMEOUT_HEADER, deadline_var
+from utils.http_client import ResilientHTTPClient
+
+AUDIENCE = "https://test-service.a.run.app"
+ISSUER = "https://accounts.google.com"
+
+
+class StubIssuer:
+    """Signs tokens with local keys and serves them as a JWKS, counting fetches"""
+
+    def __init__(self, max_age: int = 3600):
+        self.max_age = max_age
+        self.keys = {}
+        self.fetches = 0
+        self.status_code = 200
+        self.delay = 0.0
+        self.requests = []
+        self.add_key("key-1")
+
+    def add_key(self, kid: str) -> None:
+        self.keys[kid] = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    def token(self, kid: str = "key-1", ttl: float = 3600, **claims) -> str:
+        now = int(time.time())
+        payload = {"iss": ISSUER, "aud": AUDIENCE, "sub": "caller", "iat": now, "exp": now + ttl, **claims}
+        return jwt.encode(payload, self.keys[kid], algorithm="RS256", headers={"kid": kid})
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.fetches += 1
+        self.requests.append(request)
+        await asyncio.sleep(self.delay)
+        if self.status_code != 200:
+            return httpx.Response(self.status_code)
+        jwks = []
+        for kid, key in self.keys.items():
+            jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key()))
+            jwks.append({**jwk, "kid": kid, "alg": "RS256", "use": "sig"})
+        return httpx.Response(200, json={"keys": jwks}, headers={"Cache-Control": f"public, max-age={self.max_age}"})
+
+    def verifier(self, resilient: bool = False, **jwks_kwargs) -> auth.TokenVerifier:
+        client = httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+        if resilient:
+            client = ResilientHTTPClient(name="test_auth_jwks", client=client)
+        return auth.TokenVerifier(
+            audience=AUDIENCE, jwks=auth.JWKSCache(url="https://jwks", client=client, **jwks_kwargs)
+        )
+
+
+@pytest.fixture
+def issuer() -> StubIssuer:
+    return StubIssuer()
+
+
+def test_verified_tokens_cached(issuer):
+    verifier = issuer.verifier()
+    token = issuer.token()
+
+    async def verify_twice():
+        return await verifier.verify(token), await verifier.verify(token)
+
+    first, second = asyncio.run(verify_twice())
+
+    assert first == second and first["sub"] == "caller"
+    assert verifier.verifications == 1
+    assert verifier.verified.hits == 1
+    assert issuer.fetches == 1
+
+
+def test_cached_claims_not_shared(issuer):
+    verifier = issuer.verifier()
+    token = issuer.token()
+
+    async def mutate_then_verify():
+        claims = await verifier.verify(token)
+        claims["sub"] = "changed"
+        (await verifier.verify(token))["sub"] = "changed"
+        return await verifier.verify(token)
+
+    assert asyncio.run(mutate_then_verify())["sub"] == "caller"
+
+
+@pytest.mark.parametrize(
+    "claims",
+    [{"aud": "https://other-service.a.run.app"}, {"iss": "https://evil.example.com"}, {"ttl": -60}],
+    ids=["audience", "issuer", "expired"],
+)
+def test_invalid_claims_rejected(issuer, claims):
+    verifier = issuer.verifier()
+
+    with pytest.raises(jwt.InvalidTokenError):
+        asyncio.run(verifier.verify(issuer.token(**claims)))
+    assert verifier.failures == 1
+
+
+def test_invalid_signature_rejected(issuer):
+    verifier = issuer.verifier()
+    forged = StubIssuer().token()
+
+    with pytest.raises(jwt.InvalidSignatureError):
+        asyncio.run(verifier.verify(forged))
+
+
+def test_cached_token_expires(issuer):
+    verifier = issuer.verifier()
+    token = issuer.token(ttl=1)
+
+    async def verify_after_expiry():
+        await verifier.verify(token)
+        await asyncio.sleep(1.1)
+        await verifier.verify(token)
+
+    with pytest.raises(jwt.ExpiredSignatureError):
+        asyncio.run(verify_after_expiry())
+
+
+def test_unknown_key_refetches_jwks(issuer):
+    verifier = issuer.verifier(min_refresh_interval=0)
+
+    async def verify_after_rotation():
+        await verifier.verify(issuer.token())
+        issuer.add_key("key-2")
+        return await verifier.verify(issuer.token(kid="key-2"))
+
+    assert asyncio.run(verify_after_rotation())["sub"] == "caller"
+    assert issuer.fetches == 2
+
+
+def test_jwks_refreshed_in_background_after_max_age():
+    issuer = StubIssuer(max_age=0)
+    verifier = issuer.verifier()
+
+    async def verify_after_max_age():
+        await verifier.verify(issuer.token())
+        # Served from the current keys while the refresh runs
+        claims = await verifier.verify(issuer.token(sub="other"))
+        fetches_during_request = issuer.fetches
+        await verifier.jwks._refresh_task  # pylint: disable=protected-access
+        return claims, fetches_during_request
+
+    claims, fetches_during_request = asyncio.run(verify_after_max_age())
+
+    assert claims["sub"] == "other"
+    assert fetches_during_request == 1
+    assert issuer.fetches == 2 and verifier.jwks.refreshes == 2
+
+
+@pytest.mark.parametrize("outage", ["fetch_error", "empty_key_set"])
+def test_jwks_outage_fetches_at_most_every_interval(outage):
+    issuer = StubIssuer()
+    token = issuer.token()
+    if outage == "empty_key_set":
+        issuer.keys.clear()
+    else:
+        issuer.status_code = 503
+    verifier = issuer.verifier(min_refresh_interval=60)
+
+    async def verify_during_outage():
+        for _ in range(3):
+            with pytest.raises(auth.JWKSUnavailableError):
+                await verifier.verify(token)
+
+    asyncio.run(verify_during_outage())
+
+    assert issuer.fetches == 1
+    assert verifier.jwks.refresh_errors == 1
+
+
+def test_jwks_fetch_ignores_request_deadline(issuer):
+    # Shared by all requests, so not limited by the remaining budget of the request triggering it
+    verifier = issuer.verifier(resilient=True)
+    issuer.delay = 0.05
+
+    async def verify_near_deadline():
+        deadline_var.set(time.monotonic() + 0.01)
+        claims = await verifier.verify(issuer.token())
+        await verifier.jwks.client.aclose()
+        return claims
+
+    assert asyncio.run(verify_near_deadline())["sub"] == "caller"
+    assert REQUEST_TIMEOUT_HEADER not in issuer.requests[0].headers
+    assert verifier.jwks.refresh_errors == 0
+
+
+def test_jwks_fetch_timeout(issuer):
+    verifier = issuer.verifier(fetch_timeout=0.01)
+    issuer.delay = 1
+
+    with pytest.raises(auth.JWKSUnavailableError):
+        asyncio.run(verifier.verify(issuer.token()))
+    assert verifier.jwks.refresh_errors == 1
+
+
+def test_verify_id_token_dependency(issuer):
+    app = FastAPI()
+
+    @app.get("/protected")
+    async def protected(claims: dict = Depends(auth.verify_id_token)):
+        return {"sub": claims["sub"]}
+
+    auth._token_verifier = issuer.verifier()  # pylint: disable=protected-access
+    try:
+        client = TestClient(app)
+        ok = client.get("/protected", headers={"Authorization": f"Bearer {issuer.token()}"})
+        missing = client.get("/protected")
+        invalid = client.get("/protected", headers={"Authorization": "Bearer not-a-token"})
+        issuer.status_code = 503
+        auth._token_verifier = issuer.verifier()  # pylint: disable=protected-access
+        unavailable = client.get("/protected", headers={"Authorization": f"Bearer {issuer.token()}"})
+    finally:
+        auth._token_verifier = None  # pylint: disable=protected-access
+
+    assert ok.status_code == 200 and ok.json() == {"sub": "caller"}
+    assert missing.status_code == 401
+    assert invalid.status_code == 401 and invalid.headers["WWW-Authenticate"].startswith("Bearer")
+    assert unavailable.status_code == 503
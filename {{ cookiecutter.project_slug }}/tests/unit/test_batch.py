@@ -0,0 +1,133 @@
+"""Unit test batch endpoint"""
+import asyncio
+import logging
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.testclient import TestClient
+
+from api.routers import batch
+from config.logging_utils import AccessLogMiddleware, request_context_var
+from config.service_config import SERVICE_CONFIG
+
+concurrency = {"current": 0, "max": 0}
+
+app = FastAPI()
+app.add_middleware(AccessLogMiddleware)
+app.include_router(batch.router)
+
+
+@app.get("/items/{item_id}")
+async def get_item(item_id: int, detail: bool = False):
+    if item_id == 0:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return {
+        "item_id": item_id,
+        "detail": detail,
+        "trace": request_context_var.get().headers.get("x-cloud-trace-context"),
+    }
+
+
+@app.post("/items", status_code=201)
+async def create_item(item: dict):
+    return item
+
+
+@app.get("/slow")
+async def slow():
+    concurrency["current"] += 1
+    concurrency["max"] = max(concurrency["max"], concurrency["current"])
+    await asyncio.sleep(0.02)
+    concurrency["current"] -= 1
+    return {}
+
+
+@app.get("/cookies")
+async def cookies():
+    response = Response(content=b'{"broken": ', media_type="application/json")
+    response.set_cookie("a", "1")
+    response.set_cookie("b", "2")
+    return response
+
+
+@app.get("/headers")
+async def headers(request: Request):
+    return {name: request.headers.get(name) for name in ("authorization", "x-forwarded-for", "x-custom")}
+
+
+@app.get("/error")
+async def error():
+    raise RuntimeError("Handler error")
+
+
+@pytest.fixture(scope="module")
+def test_client() -> TestClient:
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_batch_preserves_sub_responses(test_client, caplog):
+    requests = [
+        {"id": "a", "path": "/items/1", "query": {"detail": "true"}},
+        {"id": "b", "method": "POST", "path": "/items", "body": {"name": "book"}},
+        {"id": "c", "path": "/items/0"},
+        {"id": "d", "path": "/not-a-route"},
+        {"id": "e", "path": "/error"},
+        {"id": "f", "method": "POST", "path": "/batch", "body": {"requests": []}},
+        {"id": "g", "path": "/items/2?detail=true"},
+        {"id": "h", "path": "/cookies"},
+    ]
+
+    with caplog.at_level(logging.INFO):
+        response = test_client.post("/batch", json={"requests": requests}, headers={"X-Cloud-Trace-Context": "abc/1"})
+
+    assert response.status_code == 200
+    responses = {sub["id"]: sub for sub in response.json()["responses"]}
+    assert [sub["id"] for sub in response.json()["responses"]] == ["a", "b", "c", "d", "e", "f", "g", "h"]
+    assert responses["a"]["status"] == 200
+    assert responses["a"]["body"] == {"item_id": 1, "detail": True, "trace": "abc/1"}
+    assert responses["b"]["status"] == 201 and responses["b"]["body"] == {"name": "book"}
+    assert responses["c"]["status"] == 404 and responses["c"]["body"] == {"detail": "Item not found"}
+    assert responses["d"]["status"] == 404
+    assert responses["e"]["status"] == 500
+    assert responses["f"]["status"] == 400
+    assert responses["g"]["status"] == 200 and responses["g"]["body"]["detail"] is True
+    # Malformed JSON is returned as text, repeated headers are kept
+    assert responses["h"]["status"] == 200 and responses["h"]["body"] == '{"broken": '
+    assert [value for name, value in responses["h"]["headers"] if name == "set-cookie"] == [
+        "a=1; Path=/; SameSite=lax",
+        "b=2; Path=/; SameSite=lax",
+    ]
+
+    # Each dispatched sub-request is logged (the nested batch is rejected before dispatch), plus the batch itself
+    access_logs = [record for record in caplog.records if record.name == "access"]
+    assert len(access_logs) == 8
+
+
+def test_sub_request_headers_cant_override_forwarded_headers(test_client):
+    spoofed = {"Authorization": "Bearer other", "X-Forwarded-For": "203.0.113.1", "X-Custom": "value"}
+    requests = [{"path": "/headers", "headers": spoofed}]
+
+    response = test_client.post(
+        "/batch", json={"requests": requests}, headers={"Authorization": "Bearer caller", "X-Forwarded-For": "10.0.0.1"}
+    )
+
+    assert response.json()["responses"][0]["body"] == {
+        "authorization": "Bearer caller",
+        "x-forwarded-for": "10.0.0.1",
+        "x-custom": "value",
+    }
+
+
+def test_batch_concurrency_limited(test_client):
+    requests = [{"path": "/slow"}] * SERVICE_CONFIG.BATCH_MAX_REQUESTS
+
+    response = test_client.post("/batch", json={"requests": requests})
+
+    assert all(sub["status"] == 200 for sub in response.json()["responses"])
+    assert 1 < concurrency["max"] <= SERVICE_CONFIG.BATCH_MAX_CONCURRENCY
+
+
+def test_batch_size_limited(test_client):
+    requests = [{"path": "/items/1"}] * (SERVICE_CONFIG.BATCH_MAX_REQUESTS + 1)
+
+    assert test_client.post("/batch", json={"requests": requests}).status_code == 422
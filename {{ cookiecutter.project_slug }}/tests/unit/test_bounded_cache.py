@@ -0,0 +1,40 @@
+"""Unit test bounded in-memory TTL cache"""
+import time
+
+from utils.bounded_cache import BoundedTTLCache
+
+
+def test_evicts_least_recently_used():
+    cache = BoundedTTLCache(max_items=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expires_items():
+    cache = BoundedTTLCache(ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.stats()["hit_ratio"] == 0.5
+
+
+def test_bounded_by_size():
+    cache = BoundedTTLCache(max_bytes=10, sizeof=len)
+    cache.set("a", b"12345")
+    cache.set("b", b"12345")
+    cache.set("c", b"1")
+
+    assert "a" not in cache
+    assert cache.total_bytes == 6
+    # Values larger than the whole cache aren't stored
+    assert cache.set("d", b"x" * 11) is False
+    assert "d" not in cache
@@ -0,0 +1,207 @@
+"""Unit test two-tier data cache"""
+import asyncio
+
+import pytest
+from pydantic import BaseModel
+
+from utils.data_cache import (
+    CacheEntry,
+    DataCache,
+    FileCacheBackend,
+    InMemoryCacheBackend,
+)
+
+
+class CountingLoader:
+    """Loader returning the values in order, counting calls"""
+
+    def __init__(self, *values, delay: float = 0):
+        self.values = list(values)
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        value = self.values.pop(0)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+def test_get_or_load_caches_value():
+    async def run():
+        cache = DataCache(name="test_cache_value")
+        loader = CountingLoader({"id": 1})
+        values = [await cache.get_or_load("a", loader) for _ in range(3)]
+        await cache.close()
+        return cache, loader, values
+
+    cache, loader, values = asyncio.run(run())
+
+    assert values == [{"id": 1}] * 3
+    assert loader.calls == 1
+    assert cache.stats()["hit_ratio"] == pytest.approx(2 / 3, abs=0.001)
+
+
+def test_concurrent_misses_share_load():
+    async def run():
+        cache = DataCache(name="test_cache_concurrent")
+        loader = CountingLoader("value", delay=0.05)
+        values = await asyncio.gather(*(cache.get_or_load("a", loader) for _ in range(5)))
+        await cache.close()
+        return loader, values
+
+    loader, values = asyncio.run(run())
+
+    assert values == ["value"] * 5
+    assert loader.calls == 1
+
+
+def test_serves_stale_while_revalidating():
+    async def run():
+        cache = DataCache(name="test_cache_stale", stale_ttl=10)
+        loader = CountingLoader("old", "new", delay=0.01)
+        first = await cache.get_or_load("a", loader, ttl=0.05)
+        await asyncio.sleep(0.06)
+        stale = await cache.get_or_load("a", loader, ttl=0.05)
+        await asyncio.sleep(0.03)
+        refreshed = await cache.get_or_load("a", loader, ttl=0.05)
+        await cache.close()
+        return cache, [first, stale, refreshed]
+
+    cache, values = asyncio.run(run())
+
+    assert values == ["old", "old", "new"]
+    assert cache.stats()["stale_hits"] == 1
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_caches_not_found_results():
+    async def run():
+        cache = DataCache(name="test_cache_negative", negative_ttl=60)
+        loader = CountingLoader(None, "found")
+        values = [await cache.get_or_load("missing", loader) for _ in range(2)]
+        await cache.close()
+        return cache, loader, values
+
+    cache, loader, values = asyncio.run(run())
+
+    assert values == [None, None]
+    assert loader.calls == 1
+    assert cache.stats()["negative_hits"] == 1
+
+
+def test_load_errors_are_not_cached():
+    async def run():
+        cache = DataCache(name="test_cache_errors")
+        loader = CountingLoader(ValueError("downstream error"), "value")
+        with pytest.raises(ValueError):
+            await cache.get_or_load("a", loader)
+        value = await cache.get_or_load("a", loader)
+        await cache.close()
+        return cache, value
+
+    cache, value = asyncio.run(run())
+
+    assert value == "value"
+    assert cache.stats()["load_errors"] == 1
+
+
+@pytest.mark.parametrize("backend", ["memory", "file"])
+def test_l2_shared_across_instances(backend, tmp_path):
+    l2 = InMemoryCacheBackend() if backend == "memory" else FileCacheBackend(str(tmp_path))
+
+    async def run():
+        # Separate caches sharing an L2, as on separate instances
+        first, second = DataCache(name="test_cache_l2_a", l2=l2), DataCache(name="test_cache_l2_b", l2=l2)
+        loader = CountingLoader({"id": 1}, {"id": 2})
+        values = [await first.get_or_load("a", loader)]
+        # L2 is written in the background after the value is returned
+        await asyncio.gather(*first._tasks)  # pylint: disable=protected-access
+        values.append(await second.get_or_load("a", loader))
+        await first.close()
+        await second.close()
+        return second, loader, values
+
+    second, loader, values = asyncio.run(run())
+
+    assert values == [{"id": 1}, {"id": 1}]
+    assert loader.calls == 1
+    assert second.stats()["l2_hits"] == 1
+
+
+@pytest.mark.parametrize("backend", ["memory", "file"])
+def test_invalid_l2_entries_reloaded(backend, tmp_path):
+    l2 = InMemoryCacheBackend() if backend == "memory" else FileCacheBackend(str(tmp_path))
+
+    async def run():
+        cache = DataCache(name="test_cache_l2_invalid", l2=l2)
+        # As left by a partial write
+        await l2.set("a", b'{"value": {"id"', ttl=60)
+        value = await cache.get_or_load("a", CountingLoader({"id": 1}))
+        await asyncio.gather(*cache._tasks)  # pylint: disable=protected-access
+        stored = await l2.get("a")
+        await cache.close()
+        return value, stored
+
+    value, stored = asyncio.run(run())
+
+    assert value == {"id": 1}
+    # The invalid entry is replaced by the reloaded value
+    assert CacheEntry.model_validate_json(stored).value == {"id": 1}
+
+
+def test_l1_bounded_by_size():
+    async def run():
+        cache = DataCache(name="test_cache_size", max_bytes=1000)
+        for i in range(10):
+            await cache.get_or_load(f"key-{i}", CountingLoader("x" * 200))
+        await cache.close()
+        return cache
+
+    stats = asyncio.run(run()).stats()
+
+    assert stats["l1_bytes"] <= 1000
+    assert stats["l1_evictions"] > 0
+
+
+class User(BaseModel):
+    id: int
+    name: str
+
+
+def test_l2_hits_validated_into_value_type():
+    l2 = InMemoryCacheBackend()
+
+    async def run():
+        first, second = DataCache(name="test_cache_typed_a", l2=l2), DataCache(name="test_cache_typed_b", l2=l2)
+        loader = CountingLoader(User(id=1, name="a"))
+        values = [await first.get_or_load("user:1", loader, value_type=User)]
+        await asyncio.gather(*first._tasks)  # pylint: disable=protected-access
+        values.append(await second.get_or_load("user:1", loader, value_type=User))
+        await first.close()
+        await second.close()
+        return values
+
+    values = asyncio.run(run())
+
+    assert values == [User(id=1, name="a")] * 2
+    assert isinstance(values[1], User)
+
+
+def test_non_json_values_cached_in_l1_only():
+    value = object()
+
+    async def run():
+        cache = DataCache(name="test_cache_non_json", l2=InMemoryCacheBackend())
+        loader = CountingLoader(value)
+        values = await asyncio.wait_for(asyncio.gather(*(cache.get_or_load("a", loader) for _ in range(2))), 1)
+        values.append(await asyncio.wait_for(cache.get_or_load("a", loader), 1))
+        await cache.close()
+        return loader, values
+
+    loader, values = asyncio.run(run())
+
+    assert values == [value] * 3
+    assert loader.calls == 1
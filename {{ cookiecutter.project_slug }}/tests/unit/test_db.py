@@ -0,0 +1,86 @@
+"""Unit test pooled async database access against a local SQLite database"""
+import asyncio
+import logging
+import time
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.deadline import deadline_var
+from db.engine import close_db, db_stats, get_db_session, init_db, pool_size_for
+
+app = FastAPI()
+
+
+@app.post("/notes/{note}")
+async def create_note(note: str, session: AsyncSession = Depends(get_db_session)):
+    await session.execute(text("INSERT INTO notes (body) VALUES (:body)"), {"body": note})
+    await session.commit()
+    return {"count": (await session.execute(text("SELECT COUNT(*) FROM notes"))).scalar_one()}
+
+
+@pytest.mark.parametrize("concurrency,workers,max_size,expected", [(1, 1, 20, 1), (80, 2, 20, 20), (10, 4, 20, 3)])
+def test_pool_size_for(concurrency, workers, max_size, expected):
+    assert pool_size_for(concurrency, workers, max_size) == expected
+
+
+def test_sessions_share_pool(tmp_path, caplog):
+    async def run():
+        engine = init_db(f"sqlite+aiosqlite:///{tmp_path}/test.db", pool_size=2, slow_query_threshold=0)
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE notes (id INTEGER PRIMARY KEY, body TEXT)"))
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*(client.post(f"/notes/note-{i}") for i in range(5)))
+
+        stats = db_stats()
+        await close_db()
+        return responses, stats
+
+    with caplog.at_level(logging.WARNING):
+        responses, stats = asyncio.run(run())
+
+    assert all(response.status_code == 200 for response in responses)
+    assert max(response.json()["count"] for response in responses) == 5
+    assert stats["pool_size"] == 2
+    assert stats["pool_wait_ms"]["p50"] is not None
+    assert stats["slow_queries"] >= 10
+    assert any(getattr(record, "json_fields", {}).get("db_statement") for record in caplog.records)
+
+
+def test_pool_wait_bounded_by_request_deadline(tmp_path):
+    async def run():
+        init_db(f"sqlite+aiosqlite:///{tmp_path}/test.db", pool_size=1, pool_timeout=10)
+        sessions = get_db_session(), get_db_session()
+        await anext(sessions[0])
+        token = deadline_var.set(time.monotonic() + 0.1)
+        try:
+            start = time.monotonic()
+            with pytest.raises(HTTPException) as exc_info:
+                await anext(sessions[1])
+            duration = time.monotonic() - start
+            assert exc_info.value.status_code == 504
+        finally:
+            deadline_var.reset(token)
+            await sessions[0].aclose()
+            await close_db()
+        return duration
+
+    assert asyncio.run(run()) < 1
+
+
+def test_failed_queries_clear_start_times(tmp_path):
+    async def run():
+        engine = init_db(f"sqlite+aiosqlite:///{tmp_path}/test.db", pool_size=1)
+        async with engine.connect() as conn:
+            with pytest.raises(Exception):
+                await conn.execute(text("SELECT * FROM missing_table"))
+            query_start = (await conn.get_raw_connection()).info.get("query_start")
+        await close_db()
+        return query_start
+
+    assert asyncio.run(run()) == []
@@ -0,0 +1,120 @@
+"""Unit test request deadlines and cancellation"""
+import asyncio
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from api.deadline import (
+    REQUEST_TIMEOUT_HEADER,
+    DeadlineMiddleware,
+    deadline_headers,
+    remaining_budget,
+)
+from api.routers.core import BaseAPIRoute
+
+
+class ShortAPIRoute(BaseAPIRoute):
+    request_timeout = 0.1
+
+
+events = []
+router = APIRouter(route_class=BaseAPIRoute)
+short_router = APIRouter(route_class=ShortAPIRoute)
+
+
+@router.get("/sleep/{seconds}")
+async def sleep(seconds: float):
+    try:
+        await asyncio.sleep(seconds)
+    except asyncio.CancelledError:
+        events.append("cancelled")
+        raise
+    return {"remaining": remaining_budget(), "headers": deadline_headers()}
+
+
+@short_router.get("/short/{seconds}")
+async def short_sleep(seconds: float):
+    await asyncio.sleep(seconds)
+    return {"remaining": remaining_budget()}
+
+
+app = FastAPI()
+app.include_router(router)
+app.include_router(short_router)
+app.add_middleware(DeadlineMiddleware, default_timeout=0.5, max_timeout=1)
+
+
+@pytest.fixture(scope="module")
+def test_client() -> TestClient:
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("header,expected", [(None, 0.5), ("200", 0.2), ("60000", 1), ("invalid", 0.5)])
+def test_request_budget(header, expected):
+    middleware = DeadlineMiddleware(app, default_timeout=0.5, max_timeout=1)
+    headers = [(REQUEST_TIMEOUT_HEADER.lower().encode(), header.encode())] if header else []
+
+    assert middleware.request_budget({"headers": headers}) == expected
+
+
+def test_remaining_budget_propagated(test_client):
+    response = test_client.get("/sleep/0", headers={REQUEST_TIMEOUT_HEADER: "300"})
+
+    assert response.status_code == 200
+    assert 0.2 < response.json()["remaining"] <= 0.3
+    assert 200 < int(response.json()["headers"][REQUEST_TIMEOUT_HEADER]) <= 300
+
+
+def test_deadline_cancels_handler(test_client):
+    events.clear()
+    response = test_client.get("/sleep/5", headers={REQUEST_TIMEOUT_HEADER: "100"})
+
+    assert response.status_code == 504
+    assert events == ["cancelled"]
+
+
+def test_route_timeout(test_client):
+    assert test_client.get("/short/0").json()["remaining"] <= 0.1
+    assert test_client.get("/short/5").status_code == 504
+
+
+def test_client_disconnect_cancels_handler():
+    events.clear()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/sleep/5",
+        "raw_path": b"/sleep/5",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+        "server": ("test", 80),
+        "client": ("test", 1234),
+    }
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # Client goes away while the handler is still running
+        await asyncio.sleep(0.05)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        start = asyncio.get_running_loop().time()
+        await app(scope, receive, send)
+        return asyncio.get_running_loop().time() - start
+
+    duration = asyncio.run(run())
+
+    assert duration < 0.4
+    assert events == ["cancelled"]
+    assert sent == []
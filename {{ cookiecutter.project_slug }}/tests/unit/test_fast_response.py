@@ -0,0 +1,72 @@
+"""Unit test fast response route class matches FastAPI's default response_model handling"""
+from typing import List, Optional
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel, Field
+
+from api.routers.core import BaseAPIRoute, FastResponseAPIRoute
+
+
+class Item(BaseModel):
+    id: int
+    name: str = Field(alias="itemName")
+    note: Optional[str] = None
+
+
+ITEMS = [Item(id=1, itemName="a"), Item(id=2, itemName="b", note="n")]
+
+
+def build_router(route_class, prefix: str) -> APIRouter:
+    router = APIRouter(prefix=prefix, route_class=route_class)
+
+    @router.get("/items", response_model=List[Item])
+    async def list_items():
+        return ITEMS
+
+    @router.get("/items/{item_id}", response_model=Item, response_model_exclude_none=True)
+    def get_item(item_id: int):
+        return ITEMS[item_id]
+
+    @router.post("/items/untrusted", response_model=Item, status_code=201)
+    async def untrusted_item():
+        # Not a model instance, so it's still validated (and filtered) by FastAPI
+        return {"id": 3, "itemName": "c", "secret": "not in response model"}
+
+    return router
+
+
+app = FastAPI()
+app.include_router(build_router(BaseAPIRoute, "/default"))
+app.include_router(build_router(FastResponseAPIRoute, "/fast"))
+
+
+@pytest.fixture(scope="module")
+def test_client() -> TestClient:
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    "method,path", [("get", "/items"), ("get", "/items/0"), ("get", "/items/1"), ("post", "/items/untrusted")]
+)
+def test_fast_response_matches_default(test_client, method, path):
+    default = test_client.request(method, "/default" + path)
+    fast = test_client.request(method, "/fast" + path)
+
+    assert fast.status_code == default.status_code
+    assert fast.headers["content-type"] == default.headers["content-type"]
+    assert fast.json() == default.json()
+
+
+def test_openapi_schema_unchanged(test_client):
+    paths = test_client.get("/openapi.json").json()["paths"]
+    for path in ["/items", "/items/{item_id}", "/items/untrusted"]:
+        default, fast = paths["/default" + path], paths["/fast" + path]
+        # Operation IDs and generated response titles include the route prefix
+        for method in default:
+            for operation in (default[method], fast[method]):
+                operation.pop("operationId")
+                for response in operation["responses"].values():
+                    response.get("content", {}).get("application/json", {}).get("schema", {}).pop("title", None)
+        assert fast == default
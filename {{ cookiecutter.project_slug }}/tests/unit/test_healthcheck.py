@@ -1,11 +1,13 @@
 """Unit test Health Check endpoint"""
-import sys
 import os
+import sys
+
 import pytest
 from fastapi.testclient import TestClient
 
-from main import app
+from api.shutdown import shutdown_coordinator
 from config.service_config import SERVICE_CONFIG
+from main import app
 
 
 @pytest.fixture(scope="module")
@@ -17,3 +19,12 @@ def test_healthcheck_endpoint(test_client):
     response = test_client.get(SERVICE_CONFIG.HEALTH_CHECK_ROUTE)
     assert response.status_code == 200
     assert response.json() == {"message": "Service is up", "status": "OK"}
+
+
+def test_readiness_endpoint(test_client, monkeypatch):
+    assert test_client.get(SERVICE_CONFIG.READINESS_ROUTE).status_code == 200
+
+    monkeypatch.setattr(shutdown_coordinator, "draining", True)
+    response = test_client.get(SERVICE_CONFIG.READINESS_ROUTE)
+    assert response.status_code == 503
+    assert response.json()["status"] == "DRAINING"
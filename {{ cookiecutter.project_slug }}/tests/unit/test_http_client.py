@@ -0,0 +1,163 @@
+"""Unit test resilient HTTP client, against a local stub server injecting latency and errors"""
+import asyncio
+import socket
+import threading
+import time
+from collections import Counter
+
+import httpx
+import pytest
+import uvicorn
+from fastapi import FastAPI, Response
+
+from utils.http_client import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientHTTPClient,
+    RetryBudget,
+)
+
+calls: Counter = Counter()
+
+stub = FastAPI()
+
+
+@stub.get("/ok")
+async def ok():
+    return {"ok": True}
+
+
+@stub.api_route("/flaky/{key}", methods=["GET", "POST"])
+async def flaky(key: str, failures: int):
+    """Responds 503 to the first `failures` calls per key"""
+    calls[key] += 1
+    if calls[key] <= failures:
+        return Response(status_code=503)
+    return {"attempt": calls[key]}
+
+
+@stub.get("/slow-once/{key}")
+async def slow_once(key: str, delay: float):
+    """The first call per key is delayed, as if it hit a slow instance"""
+    calls[key] += 1
+    if calls[key] == 1:
+        await asyncio.sleep(delay)
+    return {"attempt": calls[key]}
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join()
+
+
+def run(client: ResilientHTTPClient, requests):
+    async def run_requests():
+        try:
+            return await requests(client)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run_requests())
+
+
+def test_retries_failed_requests(base_url):
+    client = ResilientHTTPClient(name="test_retries", client=httpx.AsyncClient(base_url=base_url), backoff_base=0.01)
+
+    response = run(client, lambda c: c.get("/flaky/retry", params={"failures": 2}))
+
+    assert response.status_code == 200 and response.json() == {"attempt": 3}
+    assert client.counts["retries"] == 2
+    assert client.counts["failures"] == 2
+
+
+def test_retry_budget_limits_retries(base_url):
+    client = ResilientHTTPClient(name="test_budget", client=httpx.AsyncClient(base_url=base_url))
+    client.retry_budget = RetryBudget(ratio=0, min_per_s=0, max_tokens=0)
+
+    response = run(client, lambda c: c.get("/flaky/budget", params={"failures": 1}))
+
+    # The failed response is returned rather than retried
+    assert response.status_code == 503
+    assert calls["budget"] == 1
+    assert client.counts["retries"] == 0
+    assert client.counts["budget_exhausted"] == 1
+
+
+def test_post_not_retried(base_url):
+    async def requests(client):
+        return await client.post("/flaky/post", params={"failures": 1})
+
+    client = ResilientHTTPClient(name="test_post", client=httpx.AsyncClient(base_url=base_url))
+
+    assert run(client, requests).status_code == 503
+    assert calls["post"] == 1
+    assert client.counts["retries"] == 0
+
+
+def test_slow_requests_hedged(base_url):
+    async def requests(client):
+        # Learn the host's latency, then the first slow-once call is hedged and the duplicate wins
+        for _ in range(client.hedge_min_samples):
+            await client.get("/ok")
+        start = time.monotonic()
+        response = await client.get("/slow-once/hedge", params={"delay": 1})
+        return response, time.monotonic() - start
+
+    client = ResilientHTTPClient(
+        name="test_hedging", client=httpx.AsyncClient(base_url=base_url), hedge_min_samples=5, hedge_min_delay=0.05
+    )
+
+    response, elapsed = run(client, requests)
+
+    assert response.json() == {"attempt": 2}
+    assert elapsed < 0.5
+    assert client.counts["hedges"] == 1
+    assert client.counts["hedge_wins"] == 1
+
+
+def test_circuit_breaker_opens_per_host(base_url):
+    async def requests(client):
+        for _ in range(3):
+            await client.get("/flaky/down", params={"failures": 100})
+        with pytest.raises(CircuitOpenError):
+            await client.get("/ok")
+        # Other hosts are not affected
+        with pytest.raises(httpx.ConnectError):
+            await client.get("http://127.0.0.1:1/ok")
+
+    client = ResilientHTTPClient(
+        name="test_breaker",
+        client=httpx.AsyncClient(base_url=base_url),
+        max_retries=0,
+        breaker_failure_threshold=3,
+    )
+
+    run(client, requests)
+
+    assert calls["down"] == 3
+    assert client.counts["breaker_rejections"] == 1
+    assert client.stats()["hosts"][base_url.removeprefix("http://")]["breaker"] == CircuitBreaker.OPEN
+
+
+def test_circuit_breaker_half_open_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+
+    assert breaker.allow()
+    breaker.record(success=False)
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    # A single trial request is let through
+    assert breaker.allow() and not breaker.allow()
+    breaker.record(success=True)
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
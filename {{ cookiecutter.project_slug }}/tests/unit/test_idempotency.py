@@ -0,0 +1,101 @@
+"""Unit test Idempotency-Key route class"""
+import asyncio
+import itertools
+
+import httpx
+import pytest
+from fastapi import APIRouter, FastAPI, Response
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from api.idempotency import InMemoryIdempotencyStore
+from api.routers.core import IdempotentAPIRoute
+
+
+class Order(BaseModel):
+    item: str
+
+
+class OrdersAPIRoute(IdempotentAPIRoute):
+    idempotency_store = InMemoryIdempotencyStore(max_items=100)
+
+
+order_ids = itertools.count(1)
+router = APIRouter(route_class=OrdersAPIRoute)
+
+
+@router.post("/orders", status_code=201)
+async def create_order(order: Order, priority: bool = False):
+    await asyncio.sleep(0.05)
+    return {"order_id": next(order_ids), "item": order.item, "priority": priority}
+
+
+@router.post("/sessions", status_code=201)
+async def create_session(response: Response):
+    session_id = next(order_ids)
+    response.set_cookie("session", str(session_id))
+    return {"session_id": session_id}
+
+
+app = FastAPI()
+app.include_router(router)
+
+
+@pytest.fixture(scope="module")
+def test_client() -> TestClient:
+    return TestClient(app)
+
+
+def test_retry_replays_response(test_client):
+    headers = {"Idempotency-Key": "key-1"}
+    first = test_client.post("/orders", json={"item": "a"}, headers=headers)
+    retry = test_client.post("/orders", json={"item": "a"}, headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+
+
+def test_replay_drops_set_cookie():
+    headers = {"Idempotency-Key": "key-5"}
+    first = TestClient(app).post("/sessions", headers=headers)
+    retry = TestClient(app).post("/sessions", headers=headers)
+
+    assert retry.json() == first.json()
+    assert "set-cookie" in first.headers and "set-cookie" not in retry.headers
+
+
+def test_key_scoped_per_caller(test_client):
+    first = test_client.post("/orders", json={"item": "f"}, headers={"Idempotency-Key": "key-4", "Authorization": "a"})
+    other = test_client.post("/orders", json={"item": "f"}, headers={"Idempotency-Key": "key-4", "Authorization": "b"})
+
+    assert other.status_code == 201
+    assert other.json()["order_id"] != first.json()["order_id"]
+    assert "Idempotent-Replayed" not in other.headers
+
+
+def test_requests_without_key_are_not_deduplicated(test_client):
+    first = test_client.post("/orders", json={"item": "b"})
+    second = test_client.post("/orders", json={"item": "b"})
+    assert first.json()["order_id"] != second.json()["order_id"]
+
+
+def test_reused_key_with_different_body_is_rejected(test_client):
+    headers = {"Idempotency-Key": "key-2"}
+    assert test_client.post("/orders", json={"item": "c"}, headers=headers).status_code == 201
+    assert test_client.post("/orders", json={"item": "d"}, headers=headers).status_code == 422
+    assert test_client.post("/orders?priority=true", json={"item": "c"}, headers=headers).status_code == 422
+
+
+def test_concurrent_requests_wait_for_first():
+    async def send_concurrently():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(
+                *(client.post("/orders", json={"item": "e"}, headers={"Idempotency-Key": "key-3"}) for _ in range(3))
+            )
+
+    responses = asyncio.run(send_concurrently())
+    assert len({response.json()["order_id"] for response in responses}) == 1
+    assert sum(response.headers.get("Idempotent-Replayed") == "true" for response in responses) == 2
@@ -0,0 +1,48 @@
+"""Unit test event loop lag monitor"""
+import asyncio
+import logging
+import time
+
+from utils.loop_monitor import EventLoopMonitor
+from utils.metrics import collect_stats
+
+
+def blocking_handler():
+    time.sleep(0.3)
+
+
+async def run_monitor(block: bool) -> EventLoopMonitor:
+    monitor = EventLoopMonitor(interval=0.02, lag_threshold=0.05)
+    monitor.start()
+
+    await asyncio.sleep(0.1)
+    if block:
+        blocking_handler()
+    await asyncio.sleep(0.1)
+
+    assert "event_loop" in collect_stats()
+    await monitor.stop()
+    return monitor
+
+
+def test_blocking_call_is_reported_with_stack(caplog):
+    with caplog.at_level(logging.WARNING, logger="utils.loop_monitor"):
+        monitor = asyncio.run(run_monitor(block=True))
+
+    assert monitor.stall_count == 1
+    assert "Event loop blocked" in caplog.text
+    assert "blocking_handler" in caplog.text
+    assert caplog.records[0].json_fields["event_loop_blocked_ms"] >= 50
+
+    stats = monitor.stats()
+    assert stats["lag_ms"]["max"] >= 200
+    assert "event_loop" not in collect_stats()
+
+
+def test_idle_loop_has_no_stalls(caplog):
+    with caplog.at_level(logging.WARNING, logger="utils.loop_monitor"):
+        monitor = asyncio.run(run_monitor(block=False))
+
+    assert monitor.stall_count == 0
+    assert monitor.stats()["samples"] > 0
+    assert not caplog.records
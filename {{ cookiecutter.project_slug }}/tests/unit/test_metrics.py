@@ -0,0 +1,24 @@
+"""Unit test request metrics middleware and stats endpoint"""
+import pytest
+from fastapi.testclient import TestClient
+
+from config.service_config import SERVICE_CONFIG
+from main import app
+
+
+@pytest.fixture(scope="module")
+def test_client() -> TestClient:
+    with TestClient(app) as client:
+        yield client
+
+
+def test_metrics_endpoint_reports_requests(test_client):
+    test_client.get(SERVICE_CONFIG.HEALTH_CHECK_ROUTE)
+    test_client.get("/not-a-route")
+
+    stats = test_client.get("/metrics").json()
+
+    assert stats["requests"]["status_counts"]["2xx"] >= 1
+    assert stats["requests"]["status_counts"]["4xx"] >= 1
+    assert stats["requests"]["latency_ms"][f"GET {SERVICE_CONFIG.HEALTH_CHECK_ROUTE}"]["p50"] > 0
+    assert "GET <unmatched>" in stats["requests"]["latency_ms"]
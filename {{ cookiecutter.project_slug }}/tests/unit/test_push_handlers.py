@@ -0,0 +1,111 @@
+"""Unit test Pub/Sub and Cloud Tasks push handler router"""
+import asyncio
+from typing import List
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routers.push import (
+    PushHandlerRouter,
+    PushMessage,
+    build_cloud_tasks_headers,
+    build_pubsub_envelope,
+)
+
+
+@pytest.fixture()
+def handled() -> dict:
+    return {"orders": [], "batches": []}
+
+
+@pytest.fixture()
+def app(handled) -> FastAPI:
+    router = PushHandlerRouter(prefix="/push", stats_name="test_push_handlers")
+
+    @router.pubsub("/orders")
+    async def handle_order(message: PushMessage):
+        order = message.json_data()
+        if order.get("fail"):
+            raise RuntimeError("Downstream unavailable")
+        await asyncio.sleep(0.05)
+        handled["orders"].append(order["order_id"])
+
+    @router.cloud_tasks("/reports", batch_max_size=3, batch_max_wait=0.5)
+    async def handle_reports(messages: List[PushMessage]):
+        handled["batches"].append([message.id for message in messages])
+        return [message.id for message in messages if message.data == b"bad"]
+
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+def test_pubsub_ack_and_dedupe(app, handled):
+    test_client = TestClient(app)
+    envelope = build_pubsub_envelope({"order_id": 1}, message_id="m-1")
+
+    assert test_client.post("/push/orders", json=envelope).status_code == 204
+    # Redelivery is acked without calling the handler again
+    assert test_client.post("/push/orders", json=envelope).status_code == 204
+    assert handled["orders"] == [1]
+
+
+def test_pubsub_handler_failure_is_retried(app, handled):
+    test_client = TestClient(app)
+
+    response = test_client.post("/push/orders", json=build_pubsub_envelope({"fail": True}, message_id="m-2"))
+    assert response.status_code == 500
+
+    # Failed messages aren't marked processed, so the retry runs the handler
+    retry = build_pubsub_envelope({"order_id": 2}, message_id="m-2", delivery_attempt=2)
+    assert test_client.post("/push/orders", json=retry).status_code == 204
+    assert handled["orders"] == [2]
+
+
+@pytest.mark.parametrize(
+    "envelope",
+    [
+        {"message": {"messageId": "m-1", "data": "not-base64!"}},
+        {"message": "not-an-object"},
+        {"message": ["not", "an", "object"]},
+        ["not", "an", "envelope"],
+        {"message": {"messageId": "m-1", "attributes": "not-an-object"}},
+    ],
+    ids=["data", "message_string", "message_list", "envelope_list", "attributes"],
+)
+def test_invalid_envelope_is_not_acked(app, envelope):
+    test_client = TestClient(app)
+    assert test_client.post("/push/orders", json=envelope).status_code == 400
+    assert test_client.post("/push/reports", content=b"no task headers").status_code == 400
+
+
+def test_concurrent_duplicate_waits_for_first_delivery(app, handled):
+    async def deliver_twice():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            envelope = build_pubsub_envelope({"order_id": 3}, message_id="m-3")
+            return await asyncio.gather(*(client.post("/push/orders", json=envelope) for _ in range(2)))
+
+    responses = asyncio.run(deliver_twice())
+    assert [response.status_code for response in responses] == [204, 204]
+    assert handled["orders"] == [3]
+
+
+def test_cloud_tasks_micro_batching(app, handled):
+    async def deliver_tasks():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(
+                *(
+                    client.post("/push/reports", content=body, headers=build_cloud_tasks_headers(task_name))
+                    for task_name, body in [("t-1", b"ok"), ("t-2", b"bad"), ("t-3", b"ok")]
+                )
+            )
+
+    responses = asyncio.run(deliver_tasks())
+
+    # All three tasks are processed in a single batch, only the failed one is retried
+    assert sorted(handled["batches"][0]) == ["t-1", "t-2", "t-3"]
+    assert [response.status_code for response in responses] == [204, 500, 204]
@@ -0,0 +1,77 @@
+"""Unit test response caching route class"""
+import asyncio
+import itertools
+
+import httpx
+import pytest
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from api.response_cache import CachedAPIRoute
+from utils.bounded_cache import BoundedTTLCache
+
+
+class ItemsAPIRoute(CachedAPIRoute):
+    response_cache = BoundedTTLCache(max_items=100)
+
+
+handler_calls = itertools.count(1)
+router = APIRouter(route_class=ItemsAPIRoute)
+
+
+@router.get("/items/{item_id}")
+async def get_item(item_id: int, q: str = ""):
+    await asyncio.sleep(0.05)
+    if item_id < 0:
+        raise HTTPException(status_code=404)
+    return {"item_id": item_id, "q": q, "call": next(handler_calls)}
+
+
+app = FastAPI()
+app.include_router(router)
+
+
+@pytest.fixture(scope="module")
+def test_client() -> TestClient:
+    return TestClient(app)
+
+
+def test_repeated_get_served_from_cache(test_client):
+    first = test_client.get("/items/1")
+    second = test_client.get("/items/1")
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json() == first.json()
+
+
+@pytest.mark.parametrize(
+    "request_kwargs",
+    [
+        {"params": {"q": "other"}},
+        {"headers": {"Authorization": "Bearer other"}},
+        {"headers": {"Cache-Control": "no-cache"}},
+    ],
+)
+def test_cache_varies_by_query_and_credentials(test_client, request_kwargs):
+    cached = test_client.get("/items/2").json()
+    response = test_client.get("/items/2", **request_kwargs)
+
+    assert response.json()["call"] != cached["call"]
+
+
+def test_errors_not_cached(test_client):
+    assert test_client.get("/items/-1").status_code == 404
+    assert "X-Cache" not in test_client.get("/items/-1").headers
+
+
+def test_concurrent_misses_run_handler_once():
+    async def send_concurrently():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.get("/items/3") for _ in range(5)))
+
+    responses = asyncio.run(send_concurrently())
+
+    assert len({response.json()["call"] for response in responses}) == 1
+    assert sorted(response.headers["X-Cache"] for response in responses) == ["HIT"] * 4 + ["MISS"]
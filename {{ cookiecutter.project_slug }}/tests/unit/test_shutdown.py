@@ -0,0 +1,111 @@
+"""Unit test graceful shutdown, running the service in a server process and sending it SIGTERM mid-request"""
+import asyncio
+import importlib.util
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+import pytest
+
+from api.shutdown import InFlightMiddleware, ShutdownCoordinator
+from config.service_config import SERVICE_CONFIG, ServerMode
+
+
+def serve_with_slow_route(port: int, server_mode: str) -> None:
+    """Run the service through config/server.py with an added slow route, only called in the server process"""
+    # pylint: disable=import-outside-toplevel
+    from config import server
+    from main import app
+
+    @app.get("/test-shutdown/sleep/{seconds}")
+    async def sleep(seconds: float):
+        await asyncio.sleep(seconds)
+        return {"slept": seconds}
+
+    server.serve(host="127.0.0.1", port=port, server_mode=ServerMode(server_mode), workers=1)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(base_url: str, timeout: float = 10) -> None:
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        try:
+            httpx.get(f"{base_url}{SERVICE_CONFIG.READINESS_ROUTE}", timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise TimeoutError("Server did not start")
+
+
+def test_in_flight_middleware_counts_requests():
+    coordinator = ShutdownCoordinator()
+    counts = []
+
+    async def inner_app(scope, receive, send):
+        counts.append(coordinator.in_flight)
+
+    asyncio.run(InFlightMiddleware(inner_app, coordinator=coordinator)({"type": "http"}, None, None))
+
+    assert counts == [1]
+    assert coordinator.in_flight == 0
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="SIGTERM handling requires a Unix event loop")
+@pytest.mark.parametrize(
+    "server_mode",
+    [
+        ServerMode.UVICORN.value,
+        pytest.param(
+            ServerMode.HYPERCORN_H2C.value,
+            marks=pytest.mark.skipif(importlib.util.find_spec("hypercorn") is None, reason="hypercorn not installed"),
+        ),
+    ],
+)
+def test_sigterm_drains_in_flight_requests(server_mode):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "SHUTDOWN_GRACE_PERIOD_S": "5", "LOG_LEVEL": "INFO"}
+    serve = (
+        f"from tests.unit.test_shutdown import serve_with_slow_route; serve_with_slow_route({port}, '{server_mode}')"
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-c", serve],
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    try:
+        wait_until_ready(base_url)
+        assert httpx.get(f"{base_url}{SERVICE_CONFIG.READINESS_ROUTE}").status_code == 200
+
+        responses = []
+        request = threading.Thread(
+            target=lambda: responses.append(httpx.get(f"{base_url}/test-shutdown/sleep/1.5", timeout=10))
+        )
+        request.start()
+        time.sleep(0.3)
+
+        process.send_signal(signal.SIGTERM)
+        time.sleep(0.3)
+        readiness = httpx.get(f"{base_url}{SERVICE_CONFIG.READINESS_ROUTE}")
+
+        request.join()
+        output, _ = process.communicate(timeout=10)
+    finally:
+        process.kill()
+
+    assert readiness.status_code == 503
+    assert responses[0].status_code == 200
+    assert process.returncode in (0, -signal.SIGINT)
+    assert output.index("SIGTERM received, draining") < output.index("Drained") < output.index("Shutdown complete")
@@ -0,0 +1,103 @@
+"""Unit test streaming request ingestion and NDJSON / JSON array responses"""
+import json
+
+import pytest
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from api.routers.core import StreamingAPIRoute
+from api.streaming import (
+    JSONArrayStreamingResponse,
+    NDJSONStreamingResponse,
+    iter_ndjson,
+)
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+
+
+router = APIRouter(route_class=StreamingAPIRoute)
+
+
+@router.post("/ingest")
+async def ingest(request: Request):
+    ids = [item.id async for item in iter_ndjson(request, model=Item, max_record_bytes=100)]
+    return {"ids": ids}
+
+
+async def generate_items(count: int):
+    for i in range(count):
+        yield Item(id=i, name=f"item-{i}")
+
+
+@router.get("/export/ndjson")
+async def export_ndjson(count: int):
+    return NDJSONStreamingResponse(generate_items(count), flush_bytes=10)
+
+
+@router.get("/export/array")
+async def export_array(count: int):
+    return JSONArrayStreamingResponse(generate_items(count))
+
+
+app = FastAPI()
+app.include_router(router)
+
+
+@pytest.fixture(scope="module")
+def test_client() -> TestClient:
+    return TestClient(app)
+
+
+def ndjson_chunks():
+    # Records deliberately split across chunk boundaries, last one without a trailing newline
+    yield b'{"id": 1, "name": "a"}\n{"id": 2,'
+    yield b' "name": "b"}\n\n'
+    yield b'{"id": 3, "name": "c"}'
+
+
+def test_ingest_ndjson_across_chunks(test_client):
+    response = test_client.post("/ingest", content=ndjson_chunks())
+    assert response.status_code == 200
+    assert response.json() == {"ids": [1, 2, 3]}
+
+
+def test_ingest_invalid_json(test_client):
+    response = test_client.post("/ingest", content=b'{"id": 1, "name": "a"}\n{"id": \n')
+    assert response.status_code == 400
+    assert "line 2" in response.json()["detail"]
+
+
+def test_ingest_invalid_record(test_client):
+    response = test_client.post("/ingest", content=b'{"id": "not-an-int", "name": "a"}\n')
+    assert response.status_code == 422
+    assert response.json()["detail"]["line"] == 1
+
+
+@pytest.mark.parametrize("terminated", [False, True], ids=["partial", "complete"])
+def test_ingest_record_too_large(test_client, terminated):
+    # A complete oversized record is rejected even when it arrives in one chunk with the records around it
+    record = b'{"id": 2, "name": "' + b"x" * 200 + b'"}'
+    content = b'{"id": 1, "name": "a"}\n' + record + (b'\n{"id": 3, "name": "c"}\n' if terminated else b"")
+    response = test_client.post("/ingest", content=content)
+    assert response.status_code == 413
+    assert "line 2" in response.json()["detail"]
+
+
+def test_export_ndjson(test_client):
+    response = test_client.get("/export/ndjson", params={"count": 3})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"id": i, "name": f"item-{i}"} for i in range(3)
+    ]
+
+
+@pytest.mark.parametrize("count", [0, 1, 5])
+def test_export_json_array(test_client, count):
+    response = test_client.get("/export/array", params={"count": count})
+    assert response.status_code == 200
+    assert response.json() == [{"id": i, "name": f"item-{i}"} for i in range(count)]
@@ -0,0 +1,94 @@
+"""Micro-batching of concurrently submitted items, for handlers that are more efficient processing in bulk"""
+import asyncio
+import logging
+from typing import (
+    Awaitable,
+    Callable,
+    Generic,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+# Batch handlers can return the indexes (within the batch) of items that failed, other items are considered successful
+BatchHandler = Callable[[List[T]], Awaitable[Optional[Iterable[int]]]]
+
+
+class BatchItemError(Exception):
+    """Raised to the submitter of an item the batch handler reported as failed"""
+
+
+class MicroBatcher(Generic[T]):
+    """Collect submitted items into batches, flushed once `max_size` items are pending or `max_wait` seconds
+    after the first pending item was submitted, whichever comes first.
+    """
+
+    def __init__(self, handler: BatchHandler, max_size: int = 100, max_wait: float = 0.05):
+        self.handler = handler
+        self.max_size = max_size
+        self.max_wait = max_wait
+
+        self.batches = 0
+        self._pending: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set[asyncio.Task] = set()
+
+    async def submit(self, item: T) -> None:
+        """Add an item to the next batch and wait until it's processed, raises if processing the item failed"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_size:
+            self._flush_pending()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush_pending)
+
+        # Shield so a cancelled submitter (ex. client disconnect) doesn't cancel the rest of the batch
+        await asyncio.shield(future)
+        return
+
+    async def flush(self) -> None:
+        """Process any pending items now and wait for all running batches, ex. on shutdown"""
+        self._flush_pending()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        return
+
+    def _flush_pending(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+        return
+
+    async def _run_batch(self, batch: List[Tuple[T, asyncio.Future]]) -> None:
+        self.batches += 1
+        try:
+            failed = set(await self.handler([item for item, _ in batch]) or ())
+        except Exception as exc:  # pylint: disable=broad-except
+            logging.exception(f"Batch handler failed for batch of {len(batch)} items")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in failed:
+                future.set_exception(BatchItemError(f"Item {index} failed in batch of {len(batch)}"))
+            else:
+                future.set_result(None)
+        return
@@ -0,0 +1,117 @@
+"""In-memory LRU cache bounded by item count (and optionally total size), with per-item TTLs.
+Not thread-safe, intended for use from the event loop.
+"""
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class BoundedTTLCache:
+    """LRU cache evicting the least recently used items once `max_items` or `max_bytes` is exceeded"""
+
+    def __init__(
+        self,
+        max_items: int = 10000,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = sys.getsizeof,
+    ):
+        """
+        Args:
+            max_items (int): Max number of items to hold.
+            ttl (Optional[float]): Default seconds until an item expires, None to never expire.
+            max_bytes (Optional[int]): Max total size of held values as measured by `sizeof`, None for no limit.
+            sizeof (Callable[[Any], int]): Function returning the size of a value in bytes.
+        """
+        self.max_items = max_items
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # key -> (value, expires_at, size)
+        self._items: "OrderedDict[Hashable, Tuple[Any, Optional[float], int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._get(key, touch=False) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get an unexpired value, marking it as recently used"""
+        value = self._get(key, touch=True)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set a value, `ttl` overrides the cache's default TTL. Returns False if the value alone exceeds `max_bytes`"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+
+        self.pop(key)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return False
+
+        self._items[key] = (value, expires_at, size)
+        self.total_bytes += size
+        self._evict()
+        return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove and return a value, expired or not"""
+        item = self._items.pop(key, None)
+        if item is None:
+            return default
+        self.total_bytes -= item[2]
+        return item[0]
+
+    def clear(self) -> None:
+        """Remove all items"""
+        self._items.clear()
+        self.total_bytes = 0
+        return
+
+    def stats(self) -> dict:
+        """Current size and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "items": len(self._items),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+        }
+
+    def _get(self, key: Hashable, touch: bool) -> Any:
+        item = self._items.get(key)
+        if item is None:
+            return _MISSING
+
+        value, expires_at, _ = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.pop(key)
+            return _MISSING
+
+        if touch:
+            self._items.move_to_end(key)
+        return value
+
+    def _evict(self) -> None:
+        while len(self._items) > self.max_items or (self.max_bytes is not None and self.total_bytes > self.max_bytes):
+            _, (_, _, size) = self._items.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+        return
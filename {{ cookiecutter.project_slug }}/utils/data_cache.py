@@ -0,0 +1,390 @@
+"""Two-tier application data cache, for reference data loaded from downstream services.
+- L1: per-instance in-memory LRU, bounded by total (JSON-serialized) size.
+- L2: optional shared backend (see `CacheBackend`), so new instances don't all reload the same data.
+
+Values stored in L2 are JSON-serialized, L2 hits are returned as JSON data unless a `value_type` is given to
+re-validate them (ex. a pydantic model), values that aren't JSON serializable are only cached in L1.
+Values are served stale for `stale_ttl` seconds after they expire while a single background load refreshes them,
+`None` results are cached for `negative_ttl` seconds, and concurrent misses for a key share a single load.
+Initialized in the app lifespan (see main.py), use via `get_data_cache()`, ex.
+`await get_data_cache().get_or_load(f"user:{user_id}", lambda: fetch_user(user_id), ttl=60)`
+"""
+import abc
+import asyncio
+import hashlib
+import logging
+import os
+import sys
+import time
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from utils.bounded_cache import BoundedTTLCache
+from utils.metrics import register_stats, unregister_stats
+
+
+@lru_cache(maxsize=None)
+def _type_adapter(value_type: Any) -> TypeAdapter:
+    return TypeAdapter(value_type)
+
+
+class CacheEntry(BaseModel):
+    """Cached value with wall clock expiry times, so entries from a shared L2 expire at the same time everywhere"""
+
+    value: Any = None
+    fresh_until: float
+    stale_until: float
+    negative: bool = False
+
+    def is_fresh(self) -> bool:
+        """True until the entry's TTL expires"""
+        return time.time() < self.fresh_until
+
+    def is_usable(self) -> bool:
+        """True until the entry's stale window ends"""
+        return time.time() < self.stale_until
+
+
+class CacheBackend(abc.ABC):
+    """L2 backend interface storing serialized cache entries.
+    Implement to share cached data across instances (ex. Redis / Memorystore, Firestore)
+    """
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """Get a stored entry, None if missing or expired"""
+
+    @abc.abstractmethod
+    async def set(self, key: str, data: bytes, ttl: float) -> None:
+        """Store an entry for `ttl` seconds"""
+
+    @abc.abstractmethod
+    async def delete(self, key: str) -> None:
+        """Remove an entry, no-op if missing"""
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """Local stand-in for a shared backend, for tests and local development"""
+
+    def __init__(self, max_items: int = 100000):
+        self.cache = BoundedTTLCache(max_items=max_items)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self.cache.get(key)
+
+    async def set(self, key: str, data: bytes, ttl: float) -> None:
+        self.cache.set(key, data, ttl=ttl)
+        return
+
+    async def delete(self, key: str) -> None:
+        self.cache.pop(key)
+        return
+
+
+class FileCacheBackend(CacheBackend):
+    """Local stand-in for a shared backend storing an entry per file, ex. to keep data across local restarts.
+    Expired files are ignored and replaced on the next set, file IO runs in a thread to not block the event loop.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest())
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                expires_at, data = f.read().split(b"\n", 1)
+            expired = float(expires_at) <= time.time()
+        except (FileNotFoundError, ValueError):
+            return None
+        return None if expired else data
+
+    def _write(self, key: str, data: bytes, ttl: float) -> None:
+        # Write to a temp file and rename, so concurrent readers never see a partial entry
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(f"{time.time() + ttl}\n".encode() + data)
+        os.replace(temp_path, path)
+        return
+
+    def _delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+        return
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def set(self, key: str, data: bytes, ttl: float) -> None:
+        await asyncio.to_thread(self._write, key, data, ttl)
+        return
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._delete, key)
+        return
+
+
+class DataCache:
+    """Async get-or-load cache with an L1 LRU, optional L2 backend, stale-while-revalidate and negative caching"""
+
+    def __init__(
+        self,
+        name: str = "data_cache",
+        max_items: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 300,
+        stale_ttl: float = 60,
+        negative_ttl: float = 30,
+        l2: Optional[CacheBackend] = None,
+    ):
+        """
+        Args:
+            name (str): Name to register stats under (see utils/metrics.py).
+            max_items (int): Max number of L1 entries.
+            max_bytes (int): Max total size of L1 entries, measured by their JSON-serialized size.
+            ttl (float): Default seconds values are fresh for, can be overridden per key.
+            stale_ttl (float): Seconds expired values are still served while being refreshed in the background.
+            negative_ttl (float): Seconds `None` results are cached for.
+            l2 (Optional[CacheBackend]): Shared backend, storing JSON serializable values.
+        """
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.l2 = l2
+        self.l1 = BoundedTTLCache(max_items=max_items, max_bytes=max_bytes, sizeof=self._entry_size)
+
+        self.counts = {
+            "l1_hits": 0,
+            "l2_hits": 0,
+            "stale_hits": 0,
+            "negative_hits": 0,
+            "coalesced": 0,
+            "loads": 0,
+            "refreshes": 0,
+            "load_errors": 0,
+        }
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        register_stats(name, self.stats)
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        value_type: Optional[Any] = None,
+    ) -> Any:
+        """Get the cached value for a key, or load, cache and return it.
+
+        Args:
+            key (str): Cache key, include everything the loaded value depends on.
+            loader (Callable[[], Awaitable[Any]]): Async function loading the value, a `None` result is cached for
+                `negative_ttl` seconds, exceptions are raised to all callers waiting on the load and not cached.
+            ttl (Optional[float]): Seconds the value is fresh for, defaults to the cache's `ttl`.
+            value_type (Optional[Any]): Type of the loaded value (ex. a pydantic model or `List[User]`), L2 hits are
+                validated into it so they match L1 hits, otherwise L2 hits are returned as JSON data.
+
+        Returns:
+            Any: The cached or loaded value.
+        """
+        entry = await self._get_entry(key, value_type)
+        if entry is not None and entry.is_fresh():
+            return entry.value
+
+        if entry is not None:
+            # Serve the stale value while a single background load refreshes it
+            self.counts["stale_hits"] += 1
+            if key not in self._loading:
+                self.counts["refreshes"] += 1
+                self._start_load(key, loader, ttl, refresh=True)
+            return entry.value
+
+        if key in self._loading:
+            self.counts["coalesced"] += 1
+            return await asyncio.shield(self._loading[key])
+
+        # Loads run in a task, so a cancelled caller (ex. a disconnected client) doesn't cancel other waiters' load
+        self.counts["loads"] += 1
+        return await asyncio.shield(self._start_load(key, loader, ttl))
+
+    async def invalidate(self, key: str) -> None:
+        """Remove a key from both tiers"""
+        self.l1.pop(key)
+        if self.l2:
+            await self.l2.delete(key)
+        return
+
+    async def close(self) -> None:
+        """Cancel in progress loads and refreshes, call on shutdown"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        unregister_stats(self.name)
+        return
+
+    def stats(self) -> dict:
+        """Hit / load counters per tier, hit ratio of lookups served without waiting on their own load, and L1 size"""
+        hits = sum(self.counts[x] for x in ("l1_hits", "l2_hits", "stale_hits", "negative_hits", "coalesced"))
+        lookups = hits + self.counts["loads"]
+        l1_stats = self.l1.stats()
+        return {
+            **self.counts,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            "l1_items": l1_stats["items"],
+            "l1_bytes": l1_stats["bytes"],
+            "l1_evictions": l1_stats["evictions"],
+        }
+
+    @staticmethod
+    def _entry_size(entry: CacheEntry) -> int:
+        try:
+            return len(entry.model_dump_json())
+        except ValueError:
+            # Not JSON serializable, only cached in L1
+            return sys.getsizeof(entry.value)
+
+    async def _get_entry(self, key: str, value_type: Optional[Any] = None) -> Optional[CacheEntry]:
+        entry = self.l1.get(key)
+        if entry is not None:
+            if entry.is_fresh():
+                self.counts["negative_hits" if entry.negative else "l1_hits"] += 1
+            return entry
+
+        if not self.l2:
+            return None
+
+        try:
+            data = await self.l2.get(key)
+        except Exception:  # pylint: disable=broad-except
+            logging.exception(f"Data cache L2 get failed; key={key}")
+            return None
+
+        if data is None:
+            return None
+        try:
+            entry = CacheEntry.model_validate_json(data)
+        except ValueError:
+            # Corrupt or truncated entry, treated as a miss and removed so it's replaced by the next load
+            logging.warning(f"Data cache L2 entry invalid, deleting; key={key}", exc_info=True)
+            try:
+                await self.l2.delete(key)
+            except Exception:  # pylint: disable=broad-except
+                logging.exception(f"Data cache L2 delete failed; key={key}")
+            return None
+        if not entry.is_usable():
+            return None
+        if value_type is not None and not entry.negative:
+            try:
+                entry.value = _type_adapter(value_type).validate_python(entry.value)
+            except ValidationError:
+                logging.warning(f"Data cache L2 value doesn't match its type, reloading; key={key}", exc_info=True)
+                return None
+
+        self.l1.set(key, entry, ttl=entry.stale_until - time.time())
+        if entry.is_fresh():
+            self.counts["negative_hits" if entry.negative else "l2_hits"] += 1
+        return entry
+
+    def _start_load(
+        self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[float], refresh: bool = False
+    ) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        task = asyncio.create_task(self._load(key, future, loader, ttl, refresh))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return future
+
+    async def _load(
+        self,
+        key: str,
+        future: asyncio.Future,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float],
+        refresh: bool,
+    ) -> None:
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            # Cancelled on shutdown
+            self._loading.pop(key, None)
+            future.cancel()
+            raise
+        except Exception as exc:  # pylint: disable=broad-except
+            self._loading.pop(key, None)
+            self.counts["load_errors"] += 1
+            future.set_exception(exc)
+            # Mark retrieved, waiting callers still receive it, but a load nobody waits on isn't logged as unhandled
+            future.exception()
+            if refresh:
+                logging.warning(f"Data cache refresh failed, serving stale value; key={key}", exc_info=True)
+            return
+
+        # Set L1 before releasing waiters, so later lookups find the value instead of loading it again.
+        # Waiters always get the value, even if caching it fails.
+        entry = self._new_entry(value, ttl)
+        try:
+            if not self.l1.set(key, entry, ttl=entry.stale_until - time.time()):
+                logging.warning(f"Value too large for data cache; key={key}")
+        except Exception:  # pylint: disable=broad-except
+            logging.exception(f"Data cache L1 set failed; key={key}")
+        finally:
+            future.set_result(value)
+            self._loading.pop(key, None)
+
+        if self.l2:
+            try:
+                data = entry.model_dump_json().encode("utf-8")
+            except ValueError:
+                logging.warning(f"Value not JSON serializable, not stored in data cache L2; key={key}")
+                return
+            try:
+                await self.l2.set(key, data, ttl=entry.stale_until - time.time())
+            except Exception:  # pylint: disable=broad-except
+                logging.exception(f"Data cache L2 set failed; key={key}")
+        return
+
+    def _new_entry(self, value: Any, ttl: Optional[float]) -> CacheEntry:
+        negative = value is None
+        ttl = self.negative_ttl if negative else (self.ttl if ttl is None else ttl)
+        now = time.time()
+        return CacheEntry(value=value, fresh_until=now + ttl, stale_until=now + ttl + self.stale_ttl, negative=negative)
+
+
+_data_cache: Optional[DataCache] = None
+
+
+def init_data_cache(l2_backend: str = "none", l2_dir: Optional[str] = None, **cache_kwargs) -> DataCache:
+    """Create the service-wide data cache, called from the app lifespan.
+
+    Args:
+        l2_backend (str): `none`, `memory` or `file` (local stand-ins for a shared backend).
+        l2_dir (Optional[str]): Directory for the `file` backend.
+        **cache_kwargs: Passed to `DataCache`.
+    """
+    global _data_cache  # pylint: disable=global-statement
+
+    l2 = None
+    if l2_backend == "memory":
+        l2 = InMemoryCacheBackend()
+    elif l2_backend == "file":
+        l2 = FileCacheBackend(l2_dir)
+
+    _data_cache = DataCache(l2=l2, **cache_kwargs)
+    return _data_cache
+
+
+def get_data_cache() -> DataCache:
+    """Service-wide data cache, can also be used as a FastAPI dependency"""
+    if _data_cache is None:
+        raise RuntimeError("Data cache not initialized, see init_data_cache()")
+    return _data_cache
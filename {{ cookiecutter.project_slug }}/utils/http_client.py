@@ -0,0 +1,350 @@
+"""Resilient async HTTP client for calls to downstream services.
+- Hedging: if a safe request hasn't responded within the host's recent `hedge_percentile` latency, a duplicate is
+  sent and the first response wins, cutting tail latency caused by a single slow downstream instance.
+- Retries: idempotent requests failing with a transport error or a retryable status are retried with jittered
+  exponential backoff, within the request's deadline (see api/deadline.py).
+- Retry budget: retries and hedges are limited to a ratio of requests, so they can't multiply load on an
+  already struggling downstream.
+- Circuit breaking: per host, after `failure_threshold` consecutive failures requests fail fast with
+  `CircuitOpenError` for `reset_timeout` seconds, then a single trial request decides whether to close it again.
+
+Initialized in the app lifespan (see main.py), use via `get_http_client()`, ex.
+`response = await get_http_client().get(f"{USERS_API}/users/{user_id}")`
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from api.deadline import deadline_headers, outbound_timeout, remaining_budget
+from utils.metrics import SampleWindow, register_stats, unregister_stats
+
+SAFE_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+IDEMPOTENT_METHODS = SAFE_METHODS | {"PUT", "DELETE"}
+RETRY_STATUSES = frozenset((502, 503, 504))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to a host whose circuit breaker is open"""
+
+
+class RetryBudget:
+    """Token bucket limiting retries (and hedges) to `ratio` of requests, plus `min_per_s` so low traffic can
+    still retry. Each request deposits `ratio` tokens, each retry withdraws one.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_s: float = 1, max_tokens: float = 10):
+        self.ratio = ratio
+        self.min_per_s = min_per_s
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._updated = time.monotonic()
+
+    def deposit(self) -> None:
+        """Credit the budget for a request"""
+        self._refill()
+        self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+        return
+
+    def withdraw(self) -> bool:
+        """Spend a token for a retry or hedge, False if the budget is exhausted"""
+        self._refill()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.tokens + (now - self._updated) * self.min_per_s, self.max_tokens)
+        self._updated = now
+
+
+class CircuitBreaker:
+    """Consecutive failure circuit breaker: closed -> open after `failure_threshold` failures,
+    open -> half-open after `reset_timeout` seconds, allowing one trial request which closes or re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now"""
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+        return self.state != self.OPEN
+
+    def record(self, success: bool) -> None:
+        """Record the outcome of an allowed request"""
+        self._trial_in_flight = False
+        if success:
+            self.failures = 0
+            self.state = self.CLOSED
+            return
+
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened += 1
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+        return
+
+    def release(self) -> None:
+        """Release an allowed request without an outcome (ex. cancelled), so a half-open breaker can try again"""
+        self._trial_in_flight = False
+        return
+
+
+class ResilientHTTPClient:
+    """`httpx.AsyncClient` wrapper adding hedging, budgeted retries and per-host circuit breakers"""
+
+    def __init__(
+        self,
+        name: str = "http_client",
+        timeout: float = 10,
+        max_retries: int = 2,
+        backoff_base: float = 0.05,
+        backoff_max: float = 1,
+        retry_budget_ratio: float = 0.1,
+        retry_budget_min_per_s: float = 1,
+        hedge_percentile: float = 95,
+        hedge_min_samples: int = 20,
+        hedge_min_delay: float = 0.005,
+        breaker_failure_threshold: int = 5,
+        breaker_reset_timeout: float = 30,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        """
+        Args:
+            name (str): Name the client's stats are registered under.
+            timeout (float): Default seconds per attempt, capped by the remaining request deadline.
+            max_retries (int): Max retries per request, on top of the first attempt.
+            backoff_base (float): Backoff ceiling of the first retry, doubled each retry up to `backoff_max`.
+            backoff_max (float): Max seconds to back off between retries.
+            retry_budget_ratio (float): Ratio of requests that may be retried or hedged, see `RetryBudget`.
+            retry_budget_min_per_s (float): Retries (or hedges) allowed per second regardless of the ratio.
+            hedge_percentile (float): Latency percentile after which safe requests are hedged, 0 to disable.
+            hedge_min_samples (int): Latency samples of a host needed before its requests are hedged.
+            hedge_min_delay (float): Min seconds to wait before hedging.
+            breaker_failure_threshold (int): Consecutive failures opening a host's circuit breaker.
+            breaker_reset_timeout (float): Seconds a circuit breaker stays open before a trial request.
+            client (Optional[httpx.AsyncClient]): Underlying client, ex. with base URL or auth, created if None.
+        """
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker_failure_threshold = breaker_failure_threshold
+        self.breaker_reset_timeout = breaker_reset_timeout
+        self.client = client or httpx.AsyncClient()
+
+        self.retry_budget = RetryBudget(ratio=retry_budget_ratio, min_per_s=retry_budget_min_per_s)
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.latencies: Dict[str, SampleWindow] = {}
+        self.counts = {
+            "requests": 0,
+            "failures": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "budget_exhausted": 0,
+            "breaker_rejections": 0,
+        }
+        register_stats(name, self.stats)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        retry: Optional[bool] = None,
+        hedge: Optional[bool] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        """Send a request, returning the first successful response, or the last response / error once retries are
+        exhausted.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Request URL, relative to the underlying client's base URL if it has one.
+            retry (Optional[bool]): Whether failures can be retried, defaults to True for idempotent methods.
+            hedge (Optional[bool]): Whether slow requests can be hedged, defaults to True for safe methods.
+            **kwargs: Passed to `httpx.AsyncClient.request`, ex. `params`, `json`, `headers`.
+
+        Raises:
+            CircuitOpenError: If the host's circuit breaker is open.
+            httpx.TransportError: If the last attempt failed to get a response.
+        """
+        method = method.upper()
+        retry = method in IDEMPOTENT_METHODS if retry is None else retry
+        hedge = method in SAFE_METHODS and self.hedge_percentile > 0 if hedge is None else hedge
+        host = self.client.base_url.join(url).netloc.decode("ascii")
+        breaker = self._breaker(host)
+
+        self.counts["requests"] += 1
+        self.retry_budget.deposit()
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                self.counts["breaker_rejections"] += 1
+                raise CircuitOpenError(f"Circuit breaker open; host={host}")
+
+            response, error = None, None
+            try:
+                if hedge:
+                    response = await self._send_hedged(host, method, url, **kwargs)
+                else:
+                    response = await self._send(host, method, url, **kwargs)
+            except httpx.TransportError as exc:
+                error = exc
+            finally:
+                if response is None and error is None:
+                    # Cancelled, or a non-transport error (ex. invalid URL) which doesn't count as a host failure
+                    breaker.release()
+
+            failed = error is not None or response.status_code >= 500
+            breaker.record(success=not failed)
+            if not failed:
+                return response
+
+            self.counts["failures"] += 1
+            retryable = error is not None or response.status_code in RETRY_STATUSES
+            if not (retry and retryable and attempt < self.max_retries):
+                return self._result(response, error)
+
+            backoff = random.uniform(0, min(self.backoff_base * 2**attempt, self.backoff_max))
+            budget = remaining_budget()
+            if budget is not None and budget <= backoff:
+                # The retry wouldn't finish within the request deadline
+                return self._result(response, error)
+            if not self.retry_budget.withdraw():
+                self.counts["budget_exhausted"] += 1
+                logging.warning(f"Retry budget exhausted; host={host}; method={method}")
+                return self._result(response, error)
+
+            self.counts["retries"] += 1
+            attempt += 1
+            await asyncio.sleep(backoff)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """Send a GET request, see `request`"""
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        """Send a POST request (not retried or hedged unless enabled), see `request`"""
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self) -> None:
+        """Close the underlying client's connections, call on shutdown"""
+        await self.client.aclose()
+        unregister_stats(self.name)
+        return
+
+    def stats(self) -> dict:
+        """Request / retry / hedge counters, remaining retry budget, and per host breaker state and latency (ms)"""
+        hosts = {}
+        for host, breaker in self.breakers.items():
+            latency_ms = {
+                k: round(v * 1000, 3) if v is not None else None for k, v in self.latencies[host].percentiles().items()
+            }
+            hosts[host] = {"breaker": breaker.state, "breaker_opened": breaker.opened, "latency_ms": latency_ms}
+        return {**self.counts, "retry_budget_tokens": round(self.retry_budget.tokens, 2), "hosts": hosts}
+
+    def _breaker(self, host: str) -> CircuitBreaker:
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(self.breaker_failure_threshold, self.breaker_reset_timeout)
+            self.latencies[host] = SampleWindow()
+        return self.breakers[host]
+
+    @staticmethod
+    def _result(response: Optional[httpx.Response], error: Optional[Exception]) -> httpx.Response:
+        if response is None:
+            raise error
+        return response
+
+    async def _send(self, host: str, method: str, url: str, **kwargs) -> httpx.Response:
+        # Pass the remaining request deadline on, and don't wait past it
+        headers = {**deadline_headers(), **(kwargs.pop("headers", None) or {})}
+        start = time.monotonic()
+        response = await self.client.request(
+            method, url, headers=headers, timeout=outbound_timeout(self.timeout), **kwargs
+        )
+        self.latencies[host].add(time.monotonic() - start)
+        return response
+
+    async def _send_hedged(self, host: str, method: str, url: str, **kwargs) -> httpx.Response:
+        latencies = self.latencies[host]
+        if latencies.count < self.hedge_min_samples:
+            return await self._send(host, method, url, **kwargs)
+
+        delay = max(
+            latencies.percentiles((self.hedge_percentile,))[f"p{self.hedge_percentile:g}"], self.hedge_min_delay
+        )
+        first = asyncio.create_task(self._send(host, method, url, **kwargs))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                if self.retry_budget.withdraw():
+                    self.counts["hedges"] += 1
+                    pending.add(asyncio.create_task(self._send(host, method, url, **kwargs)))
+                else:
+                    self.counts["budget_exhausted"] += 1
+
+            # First response wins, an error only counts once no other attempt is left
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.counts["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+_http_client: Optional[ResilientHTTPClient] = None
+
+
+def init_http_client(**client_kwargs) -> ResilientHTTPClient:
+    """Create the service-wide HTTP client, called from the app lifespan.
+
+    Args:
+        **client_kwargs: Passed to `ResilientHTTPClient`.
+    """
+    global _http_client  # pylint: disable=global-statement
+    _http_client = ResilientHTTPClient(**client_kwargs)
+    return _http_client
+
+
+def get_http_client() -> ResilientHTTPClient:
+    """Service-wide HTTP client, can also be used as a FastAPI dependency"""
+    if _http_client is None:
+        raise RuntimeError("HTTP client not initialized, see init_http_client()")
+    return _http_client
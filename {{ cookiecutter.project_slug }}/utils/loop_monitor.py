@@ -0,0 +1,133 @@
+"""Event loop lag monitor, to detect handlers blocking the event loop (sync I/O, heavy CPU work, etc.)
+
+An asyncio task measures how late the loop wakes up from a fixed sleep (scheduling lag),
+while a watchdog thread captures the stack of the loop's thread if it stops ticking for longer than the threshold.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from utils.metrics import SampleWindow, register_stats, unregister_stats
+
+logger = logging.getLogger(__name__)
+
+
+class EventLoopMonitor:
+    """Measure event loop scheduling lag, and log the blocking stack when lag exceeds a threshold"""
+
+    def __init__(
+        self,
+        interval: float = 0.25,
+        lag_threshold: float = 0.1,
+        summary_interval: float = 0,
+        max_stack_frames: int = 20,
+        window_size: int = 1024,
+    ):
+        """
+        Args:
+            interval (float): Seconds between loop lag measurements.
+            lag_threshold (float): Seconds of lag after which the loop is considered blocked.
+            summary_interval (float): Seconds between lag percentile summary logs, 0 to disable.
+            max_stack_frames (int): Max number of (innermost) frames to include in captured stacks.
+            window_size (int): Number of recent lag samples to keep for percentiles.
+        """
+        self.interval = interval
+        self.lag_threshold = lag_threshold
+        self.summary_interval = summary_interval
+        self.max_stack_frames = max_stack_frames
+
+        self.lag_samples = SampleWindow(max_samples=window_size)
+        self.stall_count = 0
+
+        self._loop_thread_id: Optional[int] = None
+        self._last_tick = time.monotonic()
+        self._reported_tick: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Start monitoring the running event loop, must be called from within the loop (ex. app lifespan)"""
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stopped.clear()
+
+        self._task = asyncio.get_running_loop().create_task(self._measure_lag())
+        self._watchdog = threading.Thread(target=self._watch, name="event-loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+        register_stats("event_loop", self.stats)
+        logger.debug(f"Started event loop monitor; interval={self.interval}s; threshold={self.lag_threshold}s")
+        return
+
+    async def stop(self) -> None:
+        """Stop the lag measurement task and watchdog thread"""
+        self._stopped.set()
+        unregister_stats("event_loop")
+
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog:
+            self._watchdog.join(timeout=self.interval * 2)
+        return
+
+    def stats(self) -> dict:
+        """Lag percentiles (in milliseconds) over the recent sample window and count of detected stalls"""
+        lag_ms = {k: round(v * 1000, 3) if v is not None else None for k, v in self.lag_samples.percentiles().items()}
+        return {"lag_ms": lag_ms, "samples": self.lag_samples.count, "stalls": self.stall_count}
+
+    async def _measure_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        last_summary = loop.time()
+
+        while True:
+            expected_wakeup = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - expected_wakeup, 0.0)
+
+            self._last_tick = time.monotonic()
+            self.lag_samples.add(lag)
+
+            if self.summary_interval and loop.time() - last_summary >= self.summary_interval:
+                last_summary = loop.time()
+                logger.info("Event loop lag summary", extra={"json_fields": {"event_loop": self.stats()}})
+
+    def _watch(self) -> None:
+        # Poll at a fraction of the threshold so stalls are caught while the loop is still blocked
+        poll_interval = min(self.interval, self.lag_threshold) / 2
+
+        while not self._stopped.wait(poll_interval):
+            last_tick = self._last_tick
+            blocked_for = time.monotonic() - last_tick - self.interval
+
+            # Only report a stall once per missed tick
+            if blocked_for < self.lag_threshold or self._reported_tick == last_tick:
+                continue
+
+            self._reported_tick = last_tick
+            self.stall_count += 1
+            self._report_stall(blocked_for)
+        return
+
+    def _report_stall(self, blocked_for: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)  # pylint: disable=protected-access
+        stack = traceback.format_stack(frame)[-self.max_stack_frames :] if frame else []
+
+        logger.warning(
+            f"Event loop blocked for at least {blocked_for * 1000:.0f}ms; stack:\n{''.join(stack)}",
+            extra={
+                "json_fields": {
+                    "event_loop_blocked_ms": round(blocked_for * 1000, 3),
+                    "event_loop_stack": [line.strip() for line in stack],
+                }
+            },
+        )
+        return
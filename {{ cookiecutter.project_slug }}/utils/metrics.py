@@ -0,0 +1,58 @@
+"""Lightweight in-process metrics helpers.
+Components register a stats provider, and current values are collected on demand (ex. for logs or a metrics endpoint)
+"""
+import math
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterable, Optional
+
+_STATS_PROVIDERS: Dict[str, Callable[[], dict]] = {}
+
+
+def register_stats(name: str, provider: Callable[[], dict]) -> None:
+    """Register a callable returning a dict of current stats under a unique name"""
+    _STATS_PROVIDERS[name] = provider
+    return
+
+
+def unregister_stats(name: str) -> None:
+    """Remove a stats provider, no-op if not registered"""
+    _STATS_PROVIDERS.pop(name, None)
+    return
+
+
+def collect_stats() -> Dict[str, dict]:
+    """Collect current stats from all registered providers"""
+    return {name: provider() for name, provider in list(_STATS_PROVIDERS.items())}
+
+
+def percentile(sorted_samples: list, pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list of samples, None if there are no samples"""
+    if not sorted_samples:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_samples)), 1)
+    return sorted_samples[rank - 1]
+
+
+class SampleWindow:
+    """Thread-safe rolling window of the most recent samples, for cheap percentile stats"""
+
+    def __init__(self, max_samples: int = 1024):
+        self._samples: deque = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        """Record a sample"""
+        with self._lock:
+            self._samples.append(value)
+            self.count += 1
+        return
+
+    def percentiles(self, pcts: Iterable[float] = (50, 90, 99)) -> Dict[str, Optional[float]]:
+        """Percentiles over the current window, keyed as `p50`, `p90`, etc."""
+        with self._lock:
+            samples = sorted(self._samples)
+        stats = {f"p{pct:g}": percentile(samples, pct) for pct in pcts}
+        stats["max"] = samples[-1] if samples else None
+        return stats